@@ -0,0 +1,272 @@
+# Аналитика появления плиток: наблюдаемая доля четвёрок, распределение
+# максимальной плитки и процентили счёта по размерам поля.
+# Источники — партии из реплеев (ходы переигрываются в BatchSimulator, так
+# что видна каждая новая плитка) и массовая симуляция случайными ходами там
+# же. Память не зависит от числа партий: счётчики и StreamingHistogram.
+# Источники — генераторы, отдающие управление после каждого шага пачки:
+# экран «Шансы» продвигает их понемногу в каждом кадре.
+#
+#   python analytics.py simulate --sizes 4 5 7 --games 20000
+#   python analytics.py replays ~/.2048_replays --json report.json
+import argparse
+import itertools
+import json
+import math
+import random
+import time
+
+import numpy as np
+
+from batch import BatchSimulator
+from game_core import FOUR_PROBABILITY
+from replay import read_replays, iter_files, FLAG_FINISHED, REPLAY_DIR, VERIFY_BATCH
+from rng import derive_seed
+from stats import StreamingHistogram
+
+GRID_SIZES = (4, 5, 7)
+# Досок в одной пачке симуляции
+SIMULATION_BATCH = 256
+# Квантиль нормального распределения для 95% доверительного интервала
+CONFIDENCE_Z = 1.96
+
+
+def wilson_interval(successes, trials, z=CONFIDENCE_Z):
+    # Доверительный интервал доли по Уилсону: не вырождается при малом N
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+class SizeAnalytics:
+    # Сводка по одному размеру поля
+    def __init__(self):
+        self.games = 0
+        self.moves = 0
+        self.twos = 0
+        self.fours = 0
+        self.scores = StreamingHistogram()
+        self.max_tiles = {}
+
+    @property
+    def spawns(self):
+        return self.twos + self.fours
+
+    def add_spawns(self, twos, fours):
+        self.twos += twos
+        self.fours += fours
+
+    def add_game(self, score, max_tile, moves):
+        self.games += 1
+        self.moves += moves
+        self.scores.add(score)
+        self.max_tiles[max_tile] = self.max_tiles.get(max_tile, 0) + 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.moves += other.moves
+        self.twos += other.twos
+        self.fours += other.fours
+        self.scores.merge(other.scores)
+        for tile, n in other.max_tiles.items():
+            self.max_tiles[tile] = self.max_tiles.get(tile, 0) + n
+
+    def four_ratio(self):
+        return self.fours / self.spawns if self.spawns else 0.0
+
+    def four_ratio_interval(self):
+        return wilson_interval(self.fours, self.spawns)
+
+    def deviation(self):
+        # Отклонение наблюдаемой доли от правил в стандартных ошибках
+        if not self.spawns:
+            return 0.0
+        error = math.sqrt(FOUR_PROBABILITY * (1 - FOUR_PROBABILITY) / self.spawns)
+        return (self.four_ratio() - FOUR_PROBABILITY) / error
+
+    def top_tiles(self, limit=3):
+        # Самые частые максимальные плитки: [(плитка, доля партий)]
+        ranked = sorted(self.max_tiles.items(), key=lambda item: (-item[1], -item[0]))
+        return [(tile, n / self.games) for tile, n in ranked[:limit]]
+
+    def summary(self):
+        low, high = self.four_ratio_interval()
+        return {
+            "games": self.games,
+            "spawns": self.spawns,
+            "fours": self.fours,
+            "four_ratio": self.four_ratio(),
+            "four_ratio_95": [low, high],
+            "deviation_sigma": self.deviation(),
+            "mean_moves": self.moves / self.games if self.games else 0.0,
+            "mean_score": self.scores.mean(),
+            "p50": self.scores.percentile(50),
+            "p90": self.scores.percentile(90),
+            "p99": self.scores.percentile(99),
+            "max_score": self.scores.max or 0,
+            "max_tiles": {str(tile): n for tile, n in sorted(self.max_tiles.items())},
+        }
+
+
+class Analytics:
+    def __init__(self):
+        self.sizes = {}
+
+    def size(self, grid_size):
+        stats = self.sizes.get(grid_size)
+        if stats is None:
+            stats = self.sizes[grid_size] = SizeAnalytics()
+        return stats
+
+    def total(self):
+        total = SizeAnalytics()
+        for stats in self.sizes.values():
+            total.merge(stats)
+        return total
+
+    def summary(self):
+        result = {f"{size}x{size}": stats.summary() for size, stats in sorted(self.sizes.items())}
+        result["all"] = self.total().summary()
+        return result
+
+
+def run_batch(stats, sim, moves, skip=None):
+    # Генератор: ходы moves(t), пока она не вернёт None; шаг — один yield.
+    # Законченные партии попадают в stats сразу после последнего хода,
+    # доски из маски skip дают только новые плитки
+    counted = sim.done.copy() if skip is None else sim.done | skip
+    played = np.zeros(sim.count, np.int64)
+    twos, fours = sim.spawned_twos, sim.spawned_fours
+    for t in itertools.count():
+        step = moves(t)
+        if step is None:
+            return
+        changed, _, done = sim.step(step)
+        played += changed
+        stats.add_spawns(sim.spawned_twos - twos, sim.spawned_fours - fours)
+        twos, fours = sim.spawned_twos, sim.spawned_fours
+        finished = np.nonzero(done & ~counted)[0]
+        if len(finished):
+            tiles = sim.max_tiles()
+            for i in finished:
+                stats.add_game(int(sim.scores[i]), int(tiles[i]), int(played[i]))
+            counted[finished] = True
+        yield
+
+
+def simulate(analytics, grid_size, games=None, seed=None, batch=SIMULATION_BATCH):
+    # Случайные ходы пачками по batch досок; games=None — без конца
+    stats = analytics.size(grid_size)
+    if seed is None:
+        seed = random.getrandbits(64)
+    started = 0
+    for index in itertools.count():
+        count = batch if games is None else min(batch, games - started)
+        if count <= 0:
+            return
+        started += count
+        sim = BatchSimulator(count, grid_size, derive_seed(seed, index))
+        rng = np.random.default_rng([seed, index])
+        yield from run_batch(stats, sim, lambda t: None if sim.done.all() else rng.integers(0, 4, count))
+
+
+def replay_records(analytics, grid_size, records):
+    # Пачка записей одного размера поля: те же ходы, что при проверке реплеев.
+    # Счёт и плитка берутся только из законченных партий, новые плитки — из всех
+    stats = analytics.size(grid_size)
+    sim = BatchSimulator(len(records), grid_size, seeds=[r[2] for r in records],
+                         counters=[r[3] for r in records])
+    lengths = np.array([len(r[5]) for r in records])
+    moves = np.full((len(records), int(lengths.max())), 4, np.int64)
+    for i, record in enumerate(records):
+        moves[i, :len(record[5])] = record[5]
+    unfinished = np.array([not r[1] & FLAG_FINISHED for r in records])
+    yield from run_batch(stats, sim, lambda t: moves[:, t] if t < moves.shape[1] else None, unfinished)
+
+
+def replays(analytics, paths, batch=VERIFY_BATCH):
+    # Генератор по файлам реплеев: записи копятся по размерам поля и
+    # переигрываются пачками до batch партий
+    groups = {}
+    for path in iter_files(paths):
+        try:
+            records = list(read_replays(path))
+        except OSError:
+            continue
+        for record in records:
+            if not record[5]:
+                continue
+            group = groups.setdefault(record[0], [])
+            group.append(record)
+            if len(group) >= batch:
+                yield from replay_records(analytics, record[0], groups.pop(record[0]))
+        yield
+    for grid_size, group in sorted(groups.items()):
+        yield from replay_records(analytics, grid_size, group)
+
+
+def interleave(sources):
+    # По одному шагу каждого источника по очереди, пока все не кончатся
+    sources = list(sources)
+    while sources:
+        for source in list(sources):
+            try:
+                next(source)
+            except StopIteration:
+                sources.remove(source)
+            yield
+
+
+def run(steps, budget=None):
+    # Продвинуть генератор на budget секунд (None — до конца); False — кончился
+    deadline = None if budget is None else time.perf_counter() + budget
+    for _ in steps:
+        if deadline is not None and time.perf_counter() >= deadline:
+            return True
+    return False
+
+
+def report(analytics, elapsed):
+    for size, stats in sorted(analytics.sizes.items()):
+        s = stats.summary()
+        low, high = s["four_ratio_95"]
+        top = ", ".join(f"{tile}: {share:.1%}" for tile, share in stats.top_tiles())
+        print(f"{size}x{size}: {s['games']} партий, {s['spawns']} плиток, "
+              f"четвёрок {s['four_ratio']:.3%} [{low:.3%}, {high:.3%}], "
+              f"отклонение {s['deviation_sigma']:+.2f}σ")
+        print(f"    счёт p50 {s['p50']:.0f}, p90 {s['p90']:.0f}, p99 {s['p99']:.0f}, "
+              f"макс. {s['max_score']}; макс. плитка {top}")
+    total = analytics.total()
+    print(f"Всего: {total.spawns} плиток, четвёрок {total.four_ratio():.3%} "
+          f"(правила: {FOUR_PROBABILITY:.0%}), {elapsed:.1f} с")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Статистика появления плиток и итогов партий")
+    parser.add_argument("command", choices=["simulate", "replays"])
+    parser.add_argument("paths", nargs="*", help="файлы или папки с реплеями (для replays)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(GRID_SIZES))
+    parser.add_argument("--games", type=int, default=10000, help="партий на размер поля (для simulate)")
+    parser.add_argument("--batch", type=int, default=SIMULATION_BATCH)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", default=None, help="сохранить сводку в JSON")
+    args = parser.parse_args()
+
+    analytics = Analytics()
+    started = time.perf_counter()
+    if args.command == "simulate":
+        seeds = {size: None if args.seed is None else derive_seed(args.seed, size) for size in args.sizes}
+        run(interleave(simulate(analytics, size, args.games, seeds[size], args.batch) for size in args.sizes))
+    else:
+        run(replays(analytics, args.paths or [REPLAY_DIR]))
+    report(analytics, time.perf_counter() - started)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(analytics.summary(), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
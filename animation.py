@@ -0,0 +1,85 @@
+# Анимация хода: плитки едут из старых клеток в новые, потом слитые и
+# новая плитка «вспыхивают» масштабом. Правила хода считает GameCore,
+# здесь по полю до хода только восстанавливается, какая плитка куда уехала.
+# Клетка — индекс r * n + c, как в BoardRenderer; r = 0 — нижняя строка.
+from engine import LEFT, RIGHT, DOWN
+
+# Длительность сдвига и вспышки, с
+SLIDE_TIME = 0.08
+POP_TIME = 0.07
+# Начальный масштаб новой плитки и слитой
+SPAWN_SCALE = 0.3
+MERGE_SCALE = 1.2
+
+
+def lines(grid_size, direction):
+    # Клетки каждой линии поля, начиная с края, к которому едут плитки
+    n = grid_size
+    for i in range(n):
+        if direction == LEFT:
+            yield [i * n + c for c in range(n)]
+        elif direction == RIGHT:
+            yield [i * n + c for c in reversed(range(n))]
+        elif direction == DOWN:
+            yield [r * n + i for r in range(n)]
+        else:
+            yield [r * n + i for r in reversed(range(n))]
+
+
+def slide_paths(values, grid_size, direction):
+    # values — номиналы по клеткам до хода. Возвращает (пути, слитые клетки,
+    # номиналы после хода без новой плитки); путь — (откуда, куда)
+    paths = []
+    merged = []
+    after = [0] * len(values)
+    for line in lines(grid_size, direction):
+        target = -1
+        can_merge = False
+        for cell in line:
+            value = values[cell]
+            if not value:
+                continue
+            if can_merge and after[line[target]] == value:
+                after[line[target]] = value * 2
+                merged.append(line[target])
+                can_merge = False
+            else:
+                target += 1
+                after[line[target]] = value
+                can_merge = True
+            paths.append((cell, line[target]))
+    return paths, merged, after
+
+
+class MoveAnimation:
+    def __init__(self, paths, merged, spawned):
+        self.paths = [path for path in paths if path[0] != path[1]]
+        self.pops = [(cell, MERGE_SCALE) for cell in merged]
+        self.pops += [(cell, SPAWN_SCALE) for cell in spawned]
+        self.elapsed = 0.0
+
+    @classmethod
+    def for_move(cls, values_before, values_after, grid_size, direction):
+        paths, merged, slid = slide_paths(values_before, grid_size, direction)
+        spawned = [i for i, value in enumerate(values_after) if value and not slid[i]]
+        return cls(paths, merged, spawned)
+
+    def advance(self, delta_time):
+        self.elapsed += delta_time
+
+    @property
+    def sliding(self):
+        return self.elapsed < SLIDE_TIME
+
+    @property
+    def done(self):
+        return self.elapsed >= SLIDE_TIME + POP_TIME
+
+    def slide_progress(self):
+        # Замедление к концу пути
+        t = min(1.0, self.elapsed / SLIDE_TIME)
+        return 1 - (1 - t) * (1 - t)
+
+    def pop_scale(self, start):
+        t = min(1.0, max(0.0, (self.elapsed - SLIDE_TIME) / POP_TIME))
+        return start + (1 - start) * t
@@ -0,0 +1,189 @@
+# Правила 2048 для больших полей (16x16 и больше) на массиве numpy.
+# Упакованное в число поле и таблицы строк из engine.py на таких размерах
+# не работают: строка 64x64 — это 384 бита. Здесь поле — массив (n, n)
+# показателей log2, ход — несколько векторных операций над всеми строками
+# сразу, без циклов Python по клеткам.
+# Правила и ГСЧ те же, что у GameCore, поэтому реплеи больших полей
+# проверяются тем же BatchSimulator.
+import numpy as np
+
+from engine import cell_bits, LEFT, RIGHT, UP, DOWN
+from game_core import WIN_TILE, FOUR_PROBABILITY
+from rng import SplitMix64
+
+WIN_EXP = WIN_TILE.bit_length() - 1
+
+
+def slide_rows_left(rows, max_exp):
+    # rows: (m, n) показателей. Возвращает (новые строки, очки).
+    # Сначала сдвигаем ненулевые влево, потом в каждой серии одинаковых
+    # плиток сливаем пары с начала серии: 2 2 2 -> 4 2, 2 2 2 2 -> 4 4
+    m, n = rows.shape
+    nonzero = rows != 0
+    order = np.argsort(~nonzero, axis=1, kind="stable")
+    packed = np.take_along_axis(rows, order, axis=1)
+    valid = np.take_along_axis(nonzero, order, axis=1)
+
+    columns = np.arange(n)
+    same = np.zeros_like(valid)
+    same[:, 1:] = (packed[:, 1:] == packed[:, :-1]) & valid[:, 1:] & (packed[:, 1:] < max_exp)
+    # Номер плитки внутри серии: расстояние до начала серии
+    start = np.maximum.accumulate(np.where(same, 0, columns), axis=1)
+    head = np.zeros_like(valid)
+    head[:, :-1] = same[:, 1:] & ((columns[:-1] - start[:, :-1]) % 2 == 0)
+    keep = valid.copy()
+    keep[:, 1:] &= ~head[:, :-1]
+
+    values = packed + head
+    score = np.left_shift(1, values[head].astype(np.int64)).sum()
+    out = np.zeros_like(rows)
+    r, c = np.nonzero(keep)
+    out[r, np.cumsum(keep, axis=1)[r, c] - 1] = values[r, c]
+    return out, int(score)
+
+
+def oriented(cells, direction):
+    # Вид массива, в котором ход direction становится ходом влево.
+    # Row 0 — нижняя строка, ход вверх двигает плитки к большим r
+    if direction == LEFT:
+        return cells
+    if direction == RIGHT:
+        return cells[:, ::-1]
+    if direction == DOWN:
+        return cells.T
+    return cells.T[:, ::-1]
+
+
+class ArrayCore:
+    def __init__(self, grid_size=16, seed=None, recorder=None):
+        self.grid_size = grid_size
+        self.max_cell_exp = (1 << cell_bits(grid_size)) - 1
+        self.rng = SplitMix64(seed)
+        self.recorder = recorder
+        self.reset()
+
+    def reset(self):
+        n = self.grid_size
+        self.cells = np.zeros((n, n), np.uint8)
+        self.score = 0
+        self.game_over = self.win = False
+        self.empty_count = n * n
+        self.max_exp = 0
+        if self.recorder is not None:
+            self.recorder.begin(n, self.rng.seed, self.rng.counter)
+        for _ in range(min(2, n * n)):
+            self.spawn(2)
+
+    def load_cells(self, cells):
+        self.cells = np.array(cells, np.uint8).reshape(self.grid_size, self.grid_size)
+        self.empty_count = int(np.count_nonzero(self.cells == 0))
+        self.max_exp = int(self.cells.max())
+
+    def snapshot(self):
+        return {
+            "grid_size": self.grid_size,
+            "cells": self.cells.tobytes().hex(),
+            "score": self.score,
+            "win": self.win,
+            "game_over": self.game_over,
+            "seed": self.rng.seed,
+            "counter": self.rng.counter,
+        }
+
+    def restore(self, snapshot):
+        self.load_cells(np.frombuffer(bytes.fromhex(snapshot["cells"]), np.uint8))
+        self.score = snapshot["score"]
+        self.win = snapshot["win"]
+        self.game_over = snapshot["game_over"]
+        self.rng.seed = snapshot["seed"]
+        self.rng.counter = snapshot["counter"]
+
+    # Поле для истории ходов (history.History)
+    def board_to_bytes(self):
+        return self.cells.tobytes()
+
+    def board_from_bytes(self, data):
+        return np.frombuffer(data, np.uint8).reshape(self.grid_size, self.grid_size).copy()
+
+    def set_state(self, board, score, win, game_over, counter, max_exp):
+        self.cells = board
+        self.empty_count = int(np.count_nonzero(self.cells == 0))
+        self.max_exp = max_exp
+        self.score = score
+        self.win = win
+        self.game_over = game_over
+        self.rng.counter = counter
+
+    @property
+    def grid(self):
+        # Номиналы списком списков, как GameCore.grid; для отрисовки не нужен
+        exps = self.cells.astype(np.int64)
+        return np.where(exps > 0, np.left_shift(1, exps), 0).tolist()
+
+    def spawn(self, value):
+        # Как GameCore: k = int(u * пустых) — k-я пустая клетка по строкам
+        if not self.empty_count:
+            return
+        k = int(self.rng.random() * self.empty_count)
+        if value is None:
+            value = 4 if self.rng.random() < FOUR_PROBABILITY else 2
+        position = np.flatnonzero(self.cells.ravel() == 0)[k]
+        exp = value.bit_length() - 1
+        self.cells.flat[position] = exp
+        self.empty_count -= 1
+        if exp > self.max_exp:
+            self.max_exp = exp
+
+    def spawn_one_tile(self):
+        self.spawn(None)
+
+    def apply_move(self, direction):
+        view = oriented(self.cells, direction)
+        moved, score_gained = slide_rows_left(view, self.max_cell_exp)
+        if np.array_equal(moved, view):
+            return False
+        view[...] = moved
+        self.score += score_gained
+        self.empty_count = int(np.count_nonzero(self.cells == 0))
+        self.max_exp = int(self.cells.max())
+        if self.recorder is not None:
+            self.recorder.record(direction)
+        return True
+
+    def move_left(self):
+        return self.apply_move(LEFT)
+
+    def move_right(self):
+        return self.apply_move(RIGHT)
+
+    def move_up(self):
+        return self.apply_move(UP)
+
+    def move_down(self):
+        return self.apply_move(DOWN)
+
+    def step(self, direction):
+        if self.game_over or self.win or not self.apply_move(direction):
+            return False
+        self.spawn_one_tile()
+        self.check_game_end()
+        return True
+
+    def has_moves_possible(self):
+        if self.empty_count:
+            return True
+        cells = self.cells
+        return bool((cells[:, 1:] == cells[:, :-1]).any() or (cells[1:, :] == cells[:-1, :]).any())
+
+    def max_tile(self):
+        return 1 << self.max_exp if self.max_exp else 0
+
+    def check_game_end(self):
+        if self.max_exp >= WIN_EXP:
+            self.win = True
+        elif not self.has_moves_possible():
+            self.game_over = True
+        else:
+            return
+        if self.recorder is not None:
+            self.recorder.finish(self.score)
@@ -0,0 +1,171 @@
+# Пакетный симулятор: N досок в массиве (N, size, size) показателей log2
+# и один векторный шаг для всех досок сразу. Правила и ГСЧ совпадают с
+# GameCore: доска i ведёт себя как GameCore(size, seed=derive_seed(seed, i)).
+import random
+
+import numpy as np
+
+from engine import cell_bits, LEFT, RIGHT, UP, DOWN
+from game_core import FOUR_PROBABILITY
+from rng import GOLDEN_GAMMA, MIX_1, MIX_2, derive_seed
+
+WIN_EXP = 11  # 2048
+
+
+def splitmix_uniform(seeds, counters):
+    # Векторная версия SplitMix64.random() для пар (seed, counter)
+    with np.errstate(over="ignore"):
+        z = seeds + counters * np.uint64(GOLDEN_GAMMA)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX_1)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX_2)
+        z = z ^ (z >> np.uint64(31))
+    return (z >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+def merge_rows_left(rows, max_exp):
+    # rows: (M, size). Цикл только по столбцам, строки обрабатываются разом
+    m, size = rows.shape
+    out = np.zeros_like(rows)
+    score = np.zeros(m, np.int64)
+    write = np.zeros(m, np.intp)
+    pending = np.zeros(m, rows.dtype)
+    index = np.arange(m)
+    for j in range(size):
+        v = rows[:, j]
+        nonzero = v != 0
+        merge = nonzero & (pending == v) & (v < max_exp)
+        i = index[merge]
+        out[i, write[i]] = v[i] + 1
+        score[i] += np.left_shift(1, v[i].astype(np.int64) + 1)
+        write[i] += 1
+        pending[i] = 0
+
+        flush = nonzero & ~merge & (pending != 0)
+        i = index[flush]
+        out[i, write[i]] = pending[i]
+        write[i] += 1
+
+        take = nonzero & ~merge
+        pending[take] = v[take]
+    i = index[pending != 0]
+    out[i, write[i]] = pending[i]
+    return out, score
+
+
+def orient(boards, direction):
+    # Поворачиваем доски так, чтобы ход стал ходом влево
+    if direction == LEFT:
+        return boards
+    if direction == RIGHT:
+        return boards[:, :, ::-1]
+    if direction == DOWN:
+        return boards.transpose(0, 2, 1)
+    return boards.transpose(0, 2, 1)[:, :, ::-1]
+
+
+def unorient(boards, direction):
+    if direction == UP:
+        return boards[:, :, ::-1].transpose(0, 2, 1)
+    return orient(boards, direction)
+
+
+class BatchSimulator:
+    def __init__(self, count, grid_size=4, seed=None, seeds=None, counters=None):
+        # seeds/counters задают состояние ГСЧ каждой доски явно (например, из реплеев)
+        self.count = count
+        self.grid_size = grid_size
+        self.max_exp = (1 << cell_bits(grid_size)) - 1
+        if seeds is None:
+            if seed is None:
+                seed = random.getrandbits(64)
+            seeds = [derive_seed(seed, i) for i in range(count)]
+        self.seeds = np.array(seeds, np.uint64)
+        self.counters = np.zeros(count, np.uint64) if counters is None else np.array(counters, np.uint64)
+        # Сколько двоек и четвёрок появилось после ходов (без стартовых плиток)
+        self.spawned_twos = 0
+        self.spawned_fours = 0
+        self.reset()
+
+    def reset(self):
+        n, size = self.count, self.grid_size
+        self.boards = np.zeros((n, size, size), np.uint8)
+        self.scores = np.zeros(n, np.int64)
+        self.won = np.zeros(n, bool)
+        self.lost = np.zeros(n, bool)
+        everyone = np.arange(n)
+        for _ in range(min(2, size * size)):
+            self.spawn(everyone, initial=True)
+
+    @property
+    def done(self):
+        return self.won | self.lost
+
+    def uniforms(self, index):
+        self.counters[index] += np.uint64(1)
+        return splitmix_uniform(self.seeds[index], self.counters[index])
+
+    def spawn(self, index, initial=False):
+        # Та же семантика, что spawn_one_tile: int(u * пустых), 4 с шансом 10%
+        if not len(index):
+            return
+        flat = self.boards.reshape(self.count, -1)
+        empty = flat[index] == 0
+        free = empty.sum(axis=1)
+        has_room = free > 0
+        index, empty, free = index[has_room], empty[has_room], free[has_room]
+        if not len(index):
+            return
+        k = (self.uniforms(index) * free).astype(np.int64)
+        position = np.argmax(np.cumsum(empty, axis=1) > k[:, None], axis=1)
+        if initial:
+            values = np.ones(len(index), np.uint8)
+        else:
+            values = np.where(self.uniforms(index) < FOUR_PROBABILITY, 2, 1).astype(np.uint8)
+            fours = int(np.count_nonzero(values == 2))
+            self.spawned_fours += fours
+            self.spawned_twos += len(values) - fours
+        flat[index, position] = values
+
+    def has_moves(self):
+        b = self.boards
+        empty = (b == 0).any(axis=(1, 2))
+        horizontal = (b[:, :, 1:] == b[:, :, :-1]).any(axis=(1, 2))
+        vertical = (b[:, 1:, :] == b[:, :-1, :]).any(axis=(1, 2))
+        return empty | horizontal | vertical
+
+    def step(self, moves):
+        # moves: массив направлений LEFT/RIGHT/UP/DOWN длины count.
+        # Возвращает (changed, score_delta, done); законченные доски не меняются
+        moves = np.broadcast_to(np.asarray(moves), (self.count,))
+        size = self.grid_size
+        active = ~self.done
+        new = self.boards.copy()
+        delta = np.zeros(self.count, np.int64)
+        for direction in (LEFT, RIGHT, UP, DOWN):
+            index = np.nonzero(active & (moves == direction))[0]
+            if not len(index):
+                continue
+            rows = np.ascontiguousarray(orient(self.boards[index], direction)).reshape(-1, size)
+            merged, score = merge_rows_left(rows, self.max_exp)
+            new[index] = unorient(merged.reshape(-1, size, size), direction)
+            delta[index] = score.reshape(-1, size).sum(axis=1)
+
+        changed = (new != self.boards).reshape(self.count, -1).any(axis=1)
+        self.boards = new
+        self.scores += np.where(changed, delta, 0)
+
+        moved = np.nonzero(changed)[0]
+        self.spawn(moved)
+        self.won[moved] = (self.boards[moved] == WIN_EXP).any(axis=(1, 2))
+        still = moved[~self.won[moved]]
+        self.lost[still] = ~self.has_moves()[still]
+        return changed, np.where(changed, delta, 0), self.done.copy()
+
+    def max_tiles(self):
+        exps = self.boards.reshape(self.count, -1).max(axis=1).astype(np.int64)
+        return np.where(exps > 0, np.left_shift(1, exps), 0)
+
+    def grid(self, i):
+        # Доска i в виде списка списков, как GameCore.grid
+        exps = self.boards[i].astype(np.int64)
+        return np.where(exps > 0, np.left_shift(1, exps), 0).tolist()
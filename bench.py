@@ -0,0 +1,417 @@
+# Бенчмарки горячих мест: слияние строки, ходы, появление плитки, проверка
+# ходов, целые партии и кадр отрисовки для 4x4/5x5/7x7, время до первого
+# кадра, переходы между экранами и шаг среды для обучения (env.py).
+#
+#   python bench.py --output bench.json            — замерить и сохранить
+#   python bench.py --compare bench.json           — сравнить с базой
+#   python bench.py --only engine --sizes 4        — часть замеров
+import argparse
+import atexit
+import json
+import os
+import platform
+import random
+import statistics
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+from engine import LEFT, RIGHT, UP, DOWN
+from game_core import GameCore
+
+GRID_SIZES = (4, 5, 7)
+LARGE_GRID_SIZES = (16, 32, 64)
+BENCH_GROUPS = ["engine", "game", "batch", "large", "env", "render", "startup"]
+DIRECTION_NAMES = {LEFT: "left", RIGHT: "right", UP: "up", DOWN: "down"}
+REPEAT = 5
+# Минимальное время одного прогона timeit, с
+MIN_RUN_TIME = 0.05
+# Сколько заранее подготовленных полей тратится на один прогон замера хода
+POOL_SIZE = 2000
+# Сколько раз запускать игру для замера времени до первого кадра
+STARTUP_RUNS = 3
+# Сколько раз повторять переход меню -> экран для замера навигации
+NAVIGATION_REPEAT = 20
+# Холодный старт в отдельном процессе: импорты, окно, первый кадр меню
+STARTUP_SCRIPT = """
+import arcade
+import main
+window = arcade.Window(main.WINDOW_WIDTH, main.WINDOW_HEIGHT, "bench", visible=False)
+main.show_view(window, main.MenuView).on_draw()
+window.ctx.finish()
+print("ready", flush=True)
+window.close()
+"""
+# Замедление больше порога в режиме --compare считается регрессией
+REGRESSION_THRESHOLD = 0.10
+
+
+def measure(func):
+    # Лучшее время одного вызова по нескольким прогонам, в микросекундах
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < MIN_RUN_TIME:
+        number *= 2
+    best = min(timer.repeat(REPEAT, number)) / number
+    return best * 1e6
+
+
+def measure_on_pool(board, grid_size, func):
+    # Для вызовов, меняющих состояние: каждый вызов получает свежую копию
+    # поля из пула, подготовка пула в замер не входит
+    pool = []
+
+    def setup():
+        pool[:] = []
+        for _ in range(POOL_SIZE):
+            core = GameCore(grid_size, seed=0)
+            core.load_board(board)
+            pool.append(core)
+        pool.reverse()
+
+    timer = timeit.Timer(lambda: func(pool.pop()), setup=setup)
+    return min(timer.repeat(REPEAT, POOL_SIZE)) / POOL_SIZE * 1e6
+
+
+def random_core(grid_size, seed, moves):
+    # Партия, сыгранная на moves случайных ходов: типичное поле середины игры
+    rng = random.Random(seed)
+    core = GameCore(grid_size, seed=seed)
+    for _ in range(moves):
+        if core.win or core.game_over:
+            core.reset()
+        core.step(rng.randrange(4))
+    return core
+
+
+def random_array_core(grid_size, seed, moves):
+    # Середина партии на большом поле (ArrayCore) случайными ходами
+    from array_core import ArrayCore
+    rng = random.Random(seed)
+    core = ArrayCore(grid_size, seed=seed)
+    for _ in range(moves):
+        if core.win or core.game_over:
+            core.reset()
+        core.step(rng.randrange(4))
+    return core
+
+
+def full_board(core):
+    # Заполненное поле без соседних пар — худший случай has_moves_possible
+    n = core.grid_size
+    board = 0
+    for r in range(n):
+        for c in range(n):
+            exp = 1 + (r + c) % 2 + 2 * (r % 2)
+            board |= exp << ((r * n + c) * core.engine.bits)
+    return board
+
+
+def bench_engine(grid_size, results):
+    core = random_core(grid_size, seed=grid_size, moves=20)
+    board = core.board
+    line = core.grid[0][:]
+    results[f"merge_list_left/{grid_size}"] = measure(lambda: GameCore.merge_list_left(line))
+
+    for direction, name in DIRECTION_NAMES.items():
+        results[f"move_{name}/{grid_size}"] = measure_on_pool(
+            board, grid_size, lambda core, d=direction: core.apply_move(d))
+        results[f"engine.move_{name}/{grid_size}"] = measure(lambda d=direction: core.engine.move(board, d))
+
+    results[f"spawn_one_tile/{grid_size}"] = measure_on_pool(board, grid_size, GameCore.spawn_one_tile)
+
+    core.load_board(board)
+    results[f"has_moves_possible.empty/{grid_size}"] = measure(core.has_moves_possible)
+    core.load_board(full_board(core))
+    results[f"has_moves_possible.full/{grid_size}"] = measure(core.has_moves_possible)
+
+
+def bench_games(grid_size, results, games):
+    # Целые партии случайными ходами через GameCore.step: мкс на ход
+    rng = random.Random(grid_size)
+    moves = 0
+    start = time.perf_counter()
+    for i in range(games):
+        core = GameCore(grid_size, seed=i)
+        while not (core.win or core.game_over):
+            if core.step(rng.randrange(4)):
+                moves += 1
+    elapsed = time.perf_counter() - start
+    results[f"game.per_move/{grid_size}"] = elapsed / moves * 1e6
+    results[f"game.per_game/{grid_size}"] = elapsed / games * 1e6
+
+
+def bench_batch(grid_size, results, count=4096, steps=50):
+    try:
+        import numpy as np
+        from batch import BatchSimulator
+    except ImportError:
+        return
+    sim = BatchSimulator(count, grid_size, seed=grid_size)
+    rng = np.random.default_rng(grid_size)
+    moves = rng.integers(0, 4, (steps, count))
+    start = time.perf_counter()
+    for t in range(steps):
+        sim.step(moves[t])
+    results[f"batch.step_per_board/{grid_size}"] = (time.perf_counter() - start) / (steps * count) * 1e6
+
+
+def bench_large(results, sizes=LARGE_GRID_SIZES, moves=200):
+    # Ход и появление плитки на больших полях: мкс на полный ход
+    try:
+        from array_core import ArrayCore
+    except ImportError:
+        return
+    for grid_size in sizes:
+        cells = random_array_core(grid_size, seed=grid_size, moves=grid_size * 20).cells
+        core = ArrayCore(grid_size, seed=0)
+        rng = random.Random(grid_size)
+        directions = [rng.randrange(4) for _ in range(moves)]
+        core.load_cells(cells)
+        start = time.perf_counter()
+        for direction in directions:
+            if core.apply_move(direction):
+                core.spawn_one_tile()
+                core.has_moves_possible()
+        results[f"array.move/{grid_size}"] = (time.perf_counter() - start) / moves * 1e6
+
+
+def bench_env(grid_size, results, count=64, steps=100):
+    # Шаг среды обучения: мкс на шаг одной среды, отдельно и в векторной среде
+    # из count сред (воркеров — по числу ядер)
+    try:
+        import numpy as np
+        from env import Env2048, VectorEnv2048, random_actions
+    except ImportError:
+        return
+    env = Env2048(grid_size, seed=grid_size)
+    rng = random.Random(grid_size)
+    _, info = env.reset()
+    start = time.perf_counter()
+    for _ in range(steps * 10):
+        mask = info["action_mask"]
+        action = rng.choice([a for a in range(4) if mask[a]] or [0])
+        _, _, terminated, _, info = env.step(action)
+        if terminated:
+            _, info = env.reset()
+    results[f"env.step/{grid_size}"] = (time.perf_counter() - start) / (steps * 10) * 1e6
+
+    actions_rng = np.random.default_rng(grid_size)
+    with VectorEnv2048(count, grid_size, seed=grid_size) as vector:
+        _, info = vector.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            _, _, _, _, info = vector.step(random_actions(actions_rng, info["action_mask"]))
+        elapsed = time.perf_counter() - start
+    results[f"vecenv.step_per_env/{grid_size}"] = elapsed / (steps * count) * 1e6
+
+
+def isolate_game_files(main):
+    # Виды игры читают и пишут рекорды, автосохранение, реплеи и таблицу
+    # лидеров в ~; для замеров они подменяются файлами во временной папке
+    # до создания первого вида. atexit идёт в обратном порядке: реплеи видов
+    # и базы закрываются раньше, чем папка удаляется
+    import leaderboard
+    import storage
+    directory = tempfile.mkdtemp(prefix="bench-2048-")
+    atexit.register(shutil.rmtree, directory, True)
+    storage._storage = storage.Storage(os.path.join(directory, "best_score.json"))
+    atexit.register(storage._storage.close)
+    leaderboard._leaderboard = leaderboard.Leaderboard(os.path.join(directory, "leaderboard.sqlite3"))
+    atexit.register(leaderboard._leaderboard.close)
+    main.REPLAY_DIR = os.path.join(directory, "replays")
+
+
+def bench_render(sizes, results, frames, render=True, navigation=False):
+    # Кадр в скрытом окне; ctx.finish() ждёт, пока GPU дорисует
+    try:
+        import arcade
+        import main
+        window = arcade.Window(main.WINDOW_WIDTH, main.WINDOW_HEIGHT, "bench", visible=False)
+    except Exception as e:
+        print(f"Отрисовка пропущена: {e!r}", file=sys.stderr)
+        return
+    isolate_game_files(main)
+
+    def frame_time(view):
+        window.show_view(view)
+        view.on_draw()
+        window.ctx.finish()
+        start = time.perf_counter()
+        for _ in range(frames):
+            view.on_draw()
+            window.ctx.finish()
+        return (time.perf_counter() - start) / frames * 1e6
+
+    def label_time(renderer):
+        # Смена номинала одной клетки: цвет плитки и подпись (текстура из кэша)
+        cells = len(renderer.tiles)
+        step = iter(range(1 << 62))
+
+        def relabel():
+            i = next(step)
+            renderer.set_exp(i % cells, i % 11 + 1)
+        return measure(relabel)
+
+    def slide_frame_time(view):
+        # Кадр посреди анимации хода влево; само поле не меняется
+        from animation import MoveAnimation, SLIDE_TIME, slide_paths
+        view.draw_board()
+        paths, merged, _ = slide_paths(view.renderer.values, view.grid_size, LEFT)
+        animation = view.animation = MoveAnimation(paths, merged, [])
+        window.show_view(view)
+        start = time.perf_counter()
+        for i in range(frames):
+            animation.elapsed = SLIDE_TIME * (i % 8) / 8
+            view.on_draw()
+            window.ctx.finish()
+        elapsed = time.perf_counter() - start
+        view.finish_animation()
+        return elapsed / frames * 1e6
+
+    if render:
+        results["render.menu"] = frame_time(main.MenuView())
+    for grid_size in sizes if render else ():
+        view = main.Game2048(grid_size)
+        if view.large:
+            view.core.load_cells(random_array_core(grid_size, seed=grid_size, moves=grid_size * 20).cells)
+        else:
+            view.core.load_board(random_core(grid_size, seed=grid_size, moves=200).board)
+        results[f"render.game/{grid_size}"] = frame_time(view)
+        results[f"render.label/{grid_size}"] = label_time(view.renderer)
+        if view.animated:
+            results[f"render.slide/{grid_size}"] = slide_frame_time(view)
+    if navigation:
+        bench_navigation(window, main, results)
+    window.close()
+
+
+def bench_startup(results, runs=STARTUP_RUNS):
+    # От запуска интерпретатора до готового первого кадра меню
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-c", STARTUP_SCRIPT], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        line = proc.stdout.readline()
+        elapsed = time.perf_counter() - start
+        proc.wait()
+        if line.strip() != "ready":
+            print("Старт пропущен: процесс не нарисовал кадр", file=sys.stderr)
+            return
+        times.append(elapsed)
+    results["startup.first_frame"] = min(times) * 1e6
+
+
+def bench_navigation(window, main, results, repeat=NAVIGATION_REPEAT):
+    # Переход из меню на экран и первый кадр на нём: свежий вид на каждый
+    # переход (fresh) против вида из кэша show_view (cached)
+    def timed(show):
+        start = time.perf_counter()
+        view = show()
+        view.on_draw()
+        window.ctx.finish()
+        return time.perf_counter() - start
+
+    def fresh(view_class, args):
+        view = view_class(*args)
+        window.show_view(view)
+        return view
+
+    targets = {"rules": (main.Rules, ()), "chance": (main.Chance, ()),
+               "leaders": (main.Leaders, ()), "game4": (main.Game2048, (4,))}
+    for name, (view_class, args) in targets.items():
+        fresh_times, cached_times = [], []
+        for _ in range(repeat):
+            main.show_view(window, main.MenuView)
+            fresh_times.append(timed(lambda: fresh(view_class, args)))
+            main.show_view(window, main.MenuView)
+            cached_times.append(timed(lambda: main.show_view(window, view_class, *args)))
+        main.show_view(window, main.MenuView)
+        results[f"navigate.fresh/{name}"] = statistics.median(fresh_times) * 1e6
+        results[f"navigate.cached/{name}"] = statistics.median(cached_times) * 1e6
+
+
+def run(args):
+    results = {}
+    groups = set(args.only or BENCH_GROUPS)
+    for grid_size in args.sizes:
+        if grid_size in LARGE_GRID_SIZES:
+            # Большие поля считает ArrayCore, их меряет bench_large
+            continue
+        if "engine" in groups:
+            bench_engine(grid_size, results)
+        if "game" in groups:
+            bench_games(grid_size, results, args.games)
+        if "batch" in groups:
+            bench_batch(grid_size, results)
+        if "env" in groups:
+            bench_env(grid_size, results)
+    if "large" in groups:
+        bench_large(results)
+    if "startup" in groups:
+        bench_startup(results)
+    if "render" in groups or "startup" in groups:
+        bench_render(args.sizes, results, args.frames, "render" in groups, "startup" in groups)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "unit": "us",
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # Возвращает число регрессий; замеры без базы только печатаются
+    regressions = 0
+    base = baseline.get("results", {})
+    for name, value in sorted(report["results"].items()):
+        old = base.get(name)
+        if old is None or old <= 0:
+            print(f"{name:<36} {value:>12.2f} us   (нет в базе)")
+            continue
+        change = value / old - 1
+        mark = ""
+        if change > threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        print(f"{name:<36} {value:>12.2f} us   {old:>12.2f} us   {change:+7.1%}{mark}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарки 2048")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(GRID_SIZES))
+    parser.add_argument("--only", nargs="+", choices=BENCH_GROUPS)
+    parser.add_argument("--games", type=int, default=50, help="партий для замера game.*")
+    parser.add_argument("--frames", type=int, default=200, help="кадров для замера render.*")
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON с базовыми результатами")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        return 1 if compare(report, baseline, args.threshold) else 0
+    for name, value in sorted(report["results"].items()):
+        print(f"{name:<36} {value:>12.2f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,239 @@
+# Упакованное поле 2048.
+# Клетка хранит log2 номинала плитки (0 — пусто) в cell_bits(size) битах,
+# клетка (r, c) лежит по смещению (r * size + c) * bits. Для 4x4 всё поле
+# помещается в одно 64-битное число.
+# Ход — это несколько обращений к таблицам строк и транспонирования.
+# Таблицы заполняются при первом обращении к строке: даже для 4x4 полная
+# таблица (65536 строк) стоила бы секунды и десятков МБ в каждом процессе,
+# а партии и решатель встречают лишь малую часть строк.
+
+LEFT, RIGHT, UP, DOWN = range(4)
+
+CELL_BITS = {4: 4, 5: 5, 7: 6}
+
+def cell_bits(size):
+    return CELL_BITS.get(size, 6)
+
+
+# Куда переходит направление хода при отражениях из Engine.symmetries
+MIRROR_DIRECTION = {LEFT: RIGHT, RIGHT: LEFT, UP: UP, DOWN: DOWN}
+FLIP_DIRECTION = {LEFT: LEFT, RIGHT: RIGHT, UP: DOWN, DOWN: UP}
+TRANSPOSE_DIRECTION = {LEFT: DOWN, DOWN: LEFT, RIGHT: UP, UP: RIGHT}
+
+
+def symmetry_direction(direction, index, inverse=False):
+    # Ход на поле -> тот же ход на symmetries(поле)[index]; inverse — обратно
+    tables = []
+    if index >= 4:
+        tables.append(TRANSPOSE_DIRECTION)
+    if index & 2:
+        tables.append(FLIP_DIRECTION)
+    if index & 1:
+        tables.append(MIRROR_DIRECTION)
+    if inverse:
+        tables.reverse()
+    for table in tables:
+        direction = table[direction]
+    return direction
+
+
+def merge_exponents_left(cells, max_exp):
+    nonzeros = [x for x in cells if x]
+    merged, score = [], 0
+    i = 0
+    while i < len(nonzeros):
+        # Плитки максимального номинала не сливаются — иначе переполнится клетка
+        if i + 1 < len(nonzeros) and nonzeros[i] == nonzeros[i + 1] and nonzeros[i] < max_exp:
+            exp = nonzeros[i] + 1
+            merged.append(exp)
+            score += 1 << exp
+            i += 2
+        else:
+            merged.append(nonzeros[i])
+            i += 1
+    return merged + [0] * (len(cells) - len(merged)), score
+
+
+class _LazyTable(dict):
+    def __init__(self, build):
+        super().__init__()
+        self.build = build
+
+    def __missing__(self, key):
+        value = self.build(key)
+        self[key] = value
+        return value
+
+
+class Engine:
+    def __init__(self, size):
+        self.size = size
+        self.bits = cell_bits(size)
+        self.cell_mask = (1 << self.bits) - 1
+        self.max_exp = self.cell_mask
+        self.row_bits = size * self.bits
+        self.row_mask = (1 << self.row_bits) - 1
+        self.board_bytes = (size * self.row_bits + 7) // 8
+        self.row_shifts = [r * self.row_bits for r in range(size)]
+        self.cell_shifts = [c * self.bits for c in range(size)]
+        self.all_cell_shifts = [i * self.bits for i in range(size * size)]
+
+        self.left_table = _LazyTable(self._build_left)
+        self.right_table = _LazyTable(self._build_right)
+        self.spread_table = _LazyTable(self._build_spread)
+        self.mirror_table = _LazyTable(self._build_mirror)
+        self.info_table = _LazyTable(self._build_info)
+
+        # Маски пустых клеток строки: число единиц и позиция k-й единицы
+        masks = range(1 << size)
+        self.popcount = [bin(m).count("1") for m in masks]
+        self.select = [[c for c in range(size) if m >> c & 1] for m in masks]
+
+    # --- строки ---
+
+    def unpack_row(self, key):
+        return [(key >> s) & self.cell_mask for s in self.cell_shifts]
+
+    def pack_row(self, cells):
+        key = 0
+        for s, exp in zip(self.cell_shifts, cells):
+            key |= exp << s
+        return key
+
+    def _build_left(self, key):
+        cells, score = merge_exponents_left(self.unpack_row(key), self.max_exp)
+        return self.pack_row(cells), score
+
+    def _build_right(self, key):
+        cells, score = merge_exponents_left(self.unpack_row(key)[::-1], self.max_exp)
+        return self.pack_row(cells[::-1]), score
+
+    def _build_spread(self, key):
+        # Клетка c строки уходит в строку c столбца 0
+        spread = 0
+        for s, exp in zip(self.row_shifts, self.unpack_row(key)):
+            spread |= exp << s
+        return spread
+
+    def _build_mirror(self, key):
+        return self.pack_row(self.unpack_row(key)[::-1])
+
+    def _build_info(self, key):
+        # (маска пустых клеток, максимальный показатель, есть ли соседняя пара)
+        cells = self.unpack_row(key)
+        empty = 0
+        for c, exp in enumerate(cells):
+            if not exp:
+                empty |= 1 << c
+        has_pair = any(a == b for a, b in zip(cells, cells[1:]))
+        return empty, max(cells), has_pair
+
+    # --- поле ---
+
+    def pack(self, grid):
+        board = 0
+        shift = 0
+        for row in grid:
+            for value in row:
+                if value:
+                    board |= (value.bit_length() - 1) << shift
+                shift += self.bits
+        return board
+
+    def unpack(self, board):
+        grid = []
+        for s in self.row_shifts:
+            key = (board >> s) & self.row_mask
+            grid.append([1 << exp if exp else 0 for exp in self.unpack_row(key)])
+        return grid
+
+    def transpose(self, board):
+        spread = self.spread_table
+        mask = self.row_mask
+        result = 0
+        for r, s in enumerate(self.row_shifts):
+            result |= spread[(board >> s) & mask] << (r * self.bits)
+        return result
+
+    def mirror(self, board):
+        # Отражение слева направо
+        mirror = self.mirror_table
+        mask = self.row_mask
+        result = 0
+        for s in self.row_shifts:
+            result |= mirror[(board >> s) & mask] << s
+        return result
+
+    def flip(self, board):
+        # Отражение сверху вниз
+        mask = self.row_mask
+        result = 0
+        for s, t in zip(self.row_shifts, reversed(self.row_shifts)):
+            result |= ((board >> s) & mask) << t
+        return result
+
+    def symmetries(self, board):
+        # Все 8 отражений и поворотов квадрата
+        transposed = self.transpose(board)
+        result = []
+        for b in (board, transposed):
+            flipped = self.flip(b)
+            result += [b, self.mirror(b), flipped, self.mirror(flipped)]
+        return result
+
+    def canonical(self, board):
+        return min(self.symmetries(board))
+
+    def canonical_index(self, board):
+        # Каноническое поле и номер его симметрии — чтобы перевести ход обратно
+        boards = self.symmetries(board)
+        key = min(boards)
+        return key, boards.index(key)
+
+    def empty_shifts(self, board):
+        mask = self.cell_mask
+        return [s for s in self.all_cell_shifts if not (board >> s) & mask]
+
+    def _move_rows(self, board, table):
+        mask = self.row_mask
+        result = 0
+        score = 0
+        for s in self.row_shifts:
+            row, gained = table[(board >> s) & mask]
+            result |= row << s
+            score += gained
+        return result, score
+
+    def move_left(self, board):
+        return self._move_rows(board, self.left_table)
+
+    def move_right(self, board):
+        return self._move_rows(board, self.right_table)
+
+    def move_up(self, board):
+        # После транспонирования строка — это столбец, "вверх" — к концу строки
+        moved, score = self._move_rows(self.transpose(board), self.right_table)
+        return self.transpose(moved), score
+
+    def move_down(self, board):
+        moved, score = self._move_rows(self.transpose(board), self.left_table)
+        return self.transpose(moved), score
+
+    def move(self, board, direction):
+        if direction == LEFT:
+            return self.move_left(board)
+        if direction == RIGHT:
+            return self.move_right(board)
+        if direction == UP:
+            return self.move_up(board)
+        return self.move_down(board)
+
+
+_engines = {}
+
+
+def get_engine(size):
+    engine = _engines.get(size)
+    if engine is None:
+        engine = _engines[size] = Engine(size)
+    return engine
@@ -0,0 +1,258 @@
+# Среда для обучения с подкреплением в стиле gym: reset()/step() поверх
+# правил GameCore и векторный вариант на K средах в процессах-воркерах.
+# Наблюдение — плоскости показателей log2: obs[k, r, c] = 1, если в клетке
+# (r, c) лежит 2^k (k = 0 — пусто; r = 0 — нижняя строка, как в GameCore).
+# Векторная среда отдаёт наблюдения, награды и маски из общей памяти:
+# воркеры пишут прямо в неё, между процессами ходят только короткие команды.
+#
+#   python env.py --envs 64 --workers 4 --steps 2000   — шагов среды в секунду
+import argparse
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from engine import LEFT, RIGHT, UP, DOWN
+from game_core import GameCore
+from rng import derive_seed
+
+GRID_SIZES = (4, 5, 7)
+ACTIONS = (LEFT, RIGHT, UP, DOWN)
+# Плоскостей в наблюдении: пусто, 2, 4, ..., 2^15; большие плитки — в последней
+PLANES = 16
+
+
+def action_mask(core):
+    # Ход разрешён, если меняет поле
+    engine, board = core.engine, core.board
+    return [engine.move(board, direction)[0] != board for direction in ACTIONS]
+
+
+class Env2048:
+    def __init__(self, grid_size=4, seed=None, planes=PLANES):
+        if grid_size not in GRID_SIZES:
+            raise ValueError(f"grid_size must be one of {GRID_SIZES}")
+        self.grid_size = grid_size
+        self.planes = planes
+        self.core = GameCore(grid_size, seed=seed)
+        self.observation_shape = (planes, grid_size, grid_size)
+        self.action_count = len(ACTIONS)
+        n = grid_size
+        # Номер строки и столбца каждой клетки в порядке engine.all_cell_shifts
+        self.rows = np.repeat(np.arange(n), n)
+        self.cols = np.tile(np.arange(n), n)
+
+    def reset(self, seed=None, out=None):
+        # seed задаёт партию полностью; без него ГСЧ продолжает предыдущую серию
+        if seed is not None:
+            self.core.rng.seed = seed
+            self.core.rng.counter = 0
+        self.core.reset()
+        return self.observe(out), {"action_mask": action_mask(self.core)}
+
+    def step(self, action, out=None):
+        # Возвращает (obs, reward, terminated, truncated, info).
+        # Запрещённый ход ничего не меняет и даёт нулевую награду
+        core = self.core
+        score = core.score
+        moved = core.step(ACTIONS[action])
+        terminated = core.win or core.game_over
+        info = {"action_mask": action_mask(core), "moved": moved, "score": core.score,
+                "max_tile": core.max_tile()}
+        return self.observe(out), core.score - score, terminated, False, info
+
+    def observe(self, out=None):
+        if out is None:
+            out = np.zeros(self.observation_shape, np.uint8)
+        else:
+            out[...] = 0
+        engine, board, mask = self.core.engine, self.core.board, self.core.engine.cell_mask
+        exps = np.fromiter(((board >> s) & mask for s in engine.all_cell_shifts), np.intp,
+                           len(engine.all_cell_shifts))
+        np.minimum(exps, self.planes - 1, out=exps)
+        out[exps, self.rows, self.cols] = 1
+        return out
+
+
+class SharedBuffers:
+    # Массивы векторной среды в одном блоке общей памяти
+    def __init__(self, count, observation_shape, name=None):
+        self.layout = [
+            ("obs", (count,) + observation_shape, np.uint8),
+            ("rewards", (count,), np.int64),
+            ("terminated", (count,), np.bool_),
+            ("masks", (count, len(ACTIONS)), np.bool_),
+            ("actions", (count,), np.int8),
+            ("scores", (count,), np.int64),
+        ]
+        size = sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, shape, dtype in self.layout)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        offset = 0
+        for field, shape, dtype in self.layout:
+            array = np.ndarray(shape, dtype, buffer=self.shm.buf, offset=offset)
+            setattr(self, field, array)
+            offset += array.nbytes
+
+    def close(self):
+        for field, _, _ in self.layout:
+            setattr(self, field, None)
+        self.shm.close()
+
+
+class _Slice:
+    # Среды [start, stop) векторной среды: живут в воркере или в основном процессе
+    def __init__(self, buffers, start, stop, grid_size, seed, planes):
+        self.buffers = buffers
+        self.start = start
+        self.envs = [Env2048(grid_size, derive_seed(seed, i), planes) for i in range(start, stop)]
+
+    def reset(self):
+        b = self.buffers
+        for i, env in enumerate(self.envs, self.start):
+            _, info = env.reset(out=b.obs[i])
+            b.masks[i] = info["action_mask"]
+            b.rewards[i] = 0
+            b.terminated[i] = False
+            b.scores[i] = 0
+
+    def step(self):
+        # Законченная партия сразу начинается заново: obs — уже новой партии,
+        # terminated и scores — про закончившуюся
+        b = self.buffers
+        for i, env in enumerate(self.envs, self.start):
+            obs = b.obs[i]
+            _, reward, terminated, _, info = env.step(int(b.actions[i]), out=obs)
+            b.rewards[i] = reward
+            b.terminated[i] = terminated
+            b.scores[i] = info["score"]
+            if terminated:
+                _, info = env.reset(out=obs)
+            b.masks[i] = info["action_mask"]
+
+
+def _worker(connection, name, count, observation_shape, start, stop, grid_size, seed, planes):
+    buffers = SharedBuffers(count, observation_shape, name)
+    envs = _Slice(buffers, start, stop, grid_size, seed, planes)
+    try:
+        while True:
+            command = connection.recv()
+            if command == "step":
+                envs.step()
+            elif command == "reset":
+                envs.reset()
+            else:
+                break
+            connection.send(None)
+    finally:
+        envs.buffers = None
+        buffers.close()
+        connection.close()
+
+
+class VectorEnv2048:
+    # K сред, разложенных по workers процессам; workers=0 — всё в этом процессе.
+    # Среда i получает seed derive_seed(seed, i), так что результат не зависит
+    # от числа воркеров. Возвращаемые массивы — виды на общую память: их
+    # содержимое меняется следующим шагом
+    def __init__(self, num_envs, grid_size=4, seed=0, workers=None, planes=PLANES):
+        self.num_envs = num_envs
+        self.grid_size = grid_size
+        self.observation_shape = (planes, grid_size, grid_size)
+        self.buffers = SharedBuffers(num_envs, self.observation_shape)
+        if workers is None:
+            workers = min(num_envs, multiprocessing.cpu_count())
+        self.local = None
+        self.connections = []
+        self.processes = []
+        if not workers:
+            self.local = _Slice(self.buffers, 0, num_envs, grid_size, seed, planes)
+            return
+        bounds = np.linspace(0, num_envs, workers + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker, daemon=True,
+                args=(child, self.buffers.shm.name, num_envs, self.observation_shape,
+                      int(start), int(stop), grid_size, seed, planes))
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def call(self, command):
+        if self.local is not None:
+            getattr(self.local, command)()
+            return
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        self.call("reset")
+        b = self.buffers
+        return b.obs, {"action_mask": b.masks}
+
+    def step(self, actions):
+        b = self.buffers
+        b.actions[:] = actions
+        self.call("step")
+        return b.obs, b.rewards, b.terminated, np.zeros(self.num_envs, bool), \
+            {"action_mask": b.masks, "score": b.scores}
+
+    def close(self):
+        if self.buffers is None:
+            return
+        for connection in self.connections:
+            connection.send("close")
+        for process in self.processes:
+            process.join()
+        self.local = None
+        self.buffers.close()
+        self.buffers.shm.unlink()
+        self.buffers = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def random_actions(rng, masks):
+    # Случайный разрешённый ход в каждой среде (если ходов нет — любой)
+    noise = rng.random(masks.shape) + masks
+    return noise.argmax(axis=1)
+
+
+def measure(num_envs, grid_size, workers, steps, seed=0):
+    rng = np.random.default_rng(seed)
+    with VectorEnv2048(num_envs, grid_size, seed, workers) as env:
+        _, info = env.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            _, _, _, _, info = env.step(random_actions(rng, info["action_mask"]))
+        elapsed = time.perf_counter() - start
+    return num_envs * steps / elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Скорость векторной среды 2048")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--size", type=int, default=4, choices=GRID_SIZES)
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    rate = measure(args.envs, args.size, args.workers, args.steps, args.seed)
+    print(f"{args.size}x{args.size}, сред: {args.envs}: {rate:.0f} шагов/с")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
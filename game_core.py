@@ -0,0 +1,227 @@
+# Правила 2048 без графики: поле, ходы, появление плиток, конец игры и счёт.
+# Модуль не импортирует arcade, поэтому его можно использовать в тестах,
+# воркерах и на сервере.
+from engine import get_engine, LEFT, RIGHT, UP, DOWN
+from rng import SplitMix64
+
+WIN_TILE = 2048
+# Доля четвёрок среди новых плиток (кроме двух стартовых — там всегда 2)
+FOUR_PROBABILITY = 0.1
+
+
+class GameCore:
+    def __init__(self, grid_size=4, seed=None, recorder=None):
+        self.grid_size = grid_size
+        self.engine = get_engine(grid_size)
+        self.rng = SplitMix64(seed)
+        # Запись партии (replay.ReplayRecorder): seed в начале и поток ходов
+        self.recorder = recorder
+        self.reset()
+
+    def reset(self):
+        n = self.grid_size
+        self.grid = self.create_empty_grid(n)
+        self.board = 0
+        self.score = 0
+        self.game_over = self.win = False
+        # Индекс пустых клеток: маска по каждой строке и их общее число,
+        # плюс максимальный показатель на поле. Обновляются только по
+        # изменившимся строкам, полный обход поля не нужен.
+        self.row_empty = [(1 << n) - 1] * n
+        self.empty_count = n * n
+        self.max_exp = 0
+        if self.recorder is not None:
+            self.recorder.begin(n, self.rng.seed, self.rng.counter)
+        self.spawn_initial_tiles(2)
+
+    def load_board(self, board):
+        # Поставить готовое упакованное поле и пересобрать grid и индексы
+        n = self.grid_size
+        self.grid = self.create_empty_grid(n)
+        self.row_empty = [(1 << n) - 1] * n
+        self.empty_count = n * n
+        self.max_exp = 0
+        self.board = board
+        self.update_rows(0, board)
+
+    def snapshot(self):
+        # Компактное состояние партии: всё, что нужно для точного восстановления
+        return {
+            "grid_size": self.grid_size,
+            "board": self.board,
+            "score": self.score,
+            "win": self.win,
+            "game_over": self.game_over,
+            "seed": self.rng.seed,
+            "counter": self.rng.counter,
+        }
+
+    def restore(self, snapshot):
+        self.load_board(snapshot["board"])
+        self.score = snapshot["score"]
+        self.win = snapshot["win"]
+        self.game_over = snapshot["game_over"]
+        self.rng.seed = snapshot["seed"]
+        self.rng.counter = snapshot["counter"]
+
+    # Поле для истории ходов (history.History)
+    def board_to_bytes(self):
+        return self.board.to_bytes(self.engine.board_bytes, "little")
+
+    @staticmethod
+    def board_from_bytes(data):
+        return int.from_bytes(data, "little")
+
+    def set_state(self, board, score, win, game_over, counter, max_exp):
+        # Вернуться к сохранённому состоянию той же партии (отмена/повтор хода):
+        # grid и индексы пересчитываются только для изменившихся строк
+        self.update_rows(self.board, board)
+        self.board = board
+        self.max_exp = max_exp
+        self.score = score
+        self.win = win
+        self.game_over = game_over
+        self.rng.counter = counter
+
+    @staticmethod
+    def create_empty_grid(n):
+        return [[0] * n for _ in range(n)]
+
+    def set_tile(self, row, col, value):
+        # grid — для отрисовки, board — упакованная копия для ходов
+        shift = (row * self.grid_size + col) * self.engine.bits
+        self.board &= ~(self.engine.cell_mask << shift)
+        bit = 1 << col
+        if value:
+            exp = value.bit_length() - 1
+            self.board |= exp << shift
+            if exp > self.max_exp:
+                self.max_exp = exp
+            if self.row_empty[row] & bit:
+                self.row_empty[row] &= ~bit
+                self.empty_count -= 1
+        elif not self.row_empty[row] & bit:
+            self.row_empty[row] |= bit
+            self.empty_count += 1
+        self.grid[row][col] = value
+
+    def empty_cells(self):
+        return [(r, c) for r, mask in enumerate(self.row_empty) for c in self.engine.select[mask]]
+
+    def nth_empty_cell(self, k):
+        # k-я пустая клетка по строкам: проходим маски строк, без обхода клеток
+        popcount = self.engine.popcount
+        for r, mask in enumerate(self.row_empty):
+            count = popcount[mask]
+            if k < count:
+                return r, self.engine.select[mask][k]
+            k -= count
+        raise IndexError(k)
+
+    # Клетка выбирается как int(u * число_пустых) среди пустых клеток по строкам,
+    # номинал — 4 с вероятностью 10%. BatchSimulator повторяет это бит в бит.
+    def spawn_initial_tiles(self, count=2):
+        for _ in range(min(count, self.grid_size ** 2)):
+            r, c = self.nth_empty_cell(int(self.rng.random() * self.empty_count))
+            self.set_tile(r, c, 2)
+
+    def spawn_one_tile(self):
+        if self.empty_count:
+            r, c = self.nth_empty_cell(int(self.rng.random() * self.empty_count))
+            self.set_tile(r, c, 4 if self.rng.random() < FOUR_PROBABILITY else 2)
+
+    @staticmethod
+    def compress_list_left(line):
+        nonzeros = [x for x in line if x]
+        return nonzeros + [0] * (len(line) - len(nonzeros))
+
+    @staticmethod
+    def merge_list_left(line):
+        nonzeros = [x for x in line if x]
+        merged, score = [], 0
+        i = 0
+        while i < len(nonzeros):
+            if i + 1 < len(nonzeros) and nonzeros[i] == nonzeros[i + 1]:
+                val = nonzeros[i] * 2
+                merged.append(val)
+                score += val
+                i += 2
+            else:
+                merged.append(nonzeros[i])
+                i += 1
+        return merged + [0] * (len(line) - len(merged)), score
+
+    def apply_move(self, direction):
+        # Ход считается на упакованном поле через таблицы строк (engine.py)
+        new_board, score_gained = self.engine.move(self.board, direction)
+        if new_board == self.board:
+            return False
+        self.update_rows(self.board, new_board)
+        self.board = new_board
+        self.score += score_gained
+        if self.recorder is not None:
+            self.recorder.record(direction)
+        return True
+
+    def update_rows(self, old_board, new_board):
+        # Пересчитываем grid и индекс пустых клеток только для изменившихся строк
+        engine = self.engine
+        mask = engine.row_mask
+        info = engine.info_table
+        popcount = engine.popcount
+        for r, s in enumerate(engine.row_shifts):
+            key = (new_board >> s) & mask
+            if key == (old_board >> s) & mask:
+                continue
+            empty, row_max, _ = info[key]
+            self.empty_count += popcount[empty] - popcount[self.row_empty[r]]
+            self.row_empty[r] = empty
+            if row_max > self.max_exp:
+                self.max_exp = row_max
+            self.grid[r] = [1 << exp if exp else 0 for exp in engine.unpack_row(key)]
+
+    def move_left(self):
+        return self.apply_move(LEFT)
+
+    def move_right(self):
+        return self.apply_move(RIGHT)
+
+    def move_up(self):
+        return self.apply_move(UP)
+
+    def move_down(self):
+        return self.apply_move(DOWN)
+
+    def step(self, direction):
+        # Полный ход: сдвиг, новая плитка, проверка конца игры
+        if self.game_over or self.win or not self.apply_move(direction):
+            return False
+        self.spawn_one_tile()
+        self.check_game_end()
+        return True
+
+    def has_moves_possible(self):
+        # Пока есть пустые клетки, ход есть; иначе ищем пару в строках и столбцах
+        if self.empty_count:
+            return True
+        engine = self.engine
+        mask = engine.row_mask
+        info = engine.info_table
+        transposed = engine.transpose(self.board)
+        for s in engine.row_shifts:
+            if info[(self.board >> s) & mask][2] or info[(transposed >> s) & mask][2]:
+                return True
+        return False
+
+    def max_tile(self):
+        return 1 << self.max_exp if self.max_exp else 0
+
+    def check_game_end(self):
+        if self.max_tile() >= WIN_TILE:
+            self.win = True
+        elif not self.has_moves_possible():
+            self.game_over = True
+        else:
+            return
+        if self.recorder is not None:
+            self.recorder.finish(self.score)
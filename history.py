@@ -0,0 +1,87 @@
+# История ходов для отмены и повтора.
+# Каждое состояние хранится одной строкой байт: счёт, счётчик ГСЧ, флаги,
+# ход и упакованное поле из GameCore.board — для 7x7 это меньше 100 байт
+# вместо копии grid из списков (у ArrayCore — байт на клетку). Объём истории ограничен max_bytes, при
+# превышении выбрасываются самые старые записи.
+import struct
+import sys
+from collections import deque
+
+# Лимит памяти на историю одной партии по умолчанию, байт
+UNDO_MEMORY = 16 * 1024 * 1024
+# счёт, счётчик ГСЧ, флаги (win, game_over), ход, максимальный показатель
+STATE = struct.Struct("<QQBBB")
+FLAG_WIN = 1
+FLAG_GAME_OVER = 2
+
+
+class History:
+    def __init__(self, core, max_bytes=UNDO_MEMORY):
+        self.core = core
+        # Все записи одного размера, поэтому лимит памяти — это лимит числа
+        # записей, и старые вытесняет сам deque. Отмена переносит запись в
+        # повтор и обратно, так что вместе стеки не превышают лимит
+        entry_size = sys.getsizeof(bytes(STATE.size + len(core.board_to_bytes())))
+        self.undo_stack = deque(maxlen=max(1, max_bytes // entry_size))
+        self.redo_stack = []
+
+    def pack(self, direction):
+        core = self.core
+        flags = (FLAG_WIN if core.win else 0) | (FLAG_GAME_OVER if core.game_over else 0)
+        return (STATE.pack(core.score, core.rng.counter, flags, direction, core.max_exp)
+                + core.board_to_bytes())
+
+    def unpack(self, data):
+        score, counter, flags, direction, max_exp = STATE.unpack_from(data)
+        board = self.core.board_from_bytes(data[STATE.size:])
+        self.core.set_state(board, score, bool(flags & FLAG_WIN), bool(flags & FLAG_GAME_OVER),
+                            counter, max_exp)
+        return direction
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+
+    def record(self, data):
+        # data — pack(direction), снятый до сделанного хода direction.
+        # Новый ход отменяет ветку повтора
+        self.undo_stack.append(data)
+        if self.redo_stack:
+            self.redo_stack = []
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        data = self.undo_stack.pop()
+        # Текущее состояние уходит в повтор вместе с ходом, который к нему привёл
+        direction = self.unpack_direction(data)
+        self.redo_stack.append(self.pack(direction))
+        self.unpack(data)
+        recorder = self.core.recorder
+        if recorder is not None:
+            recorder.rewind()
+        return direction
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        data = self.redo_stack.pop()
+        direction = self.unpack_direction(data)
+        self.undo_stack.append(self.pack(direction))
+        self.unpack(data)
+        recorder = self.core.recorder
+        if recorder is not None:
+            recorder.record(direction)
+            if self.core.win or self.core.game_over:
+                recorder.finish(self.core.score)
+        return direction
+
+    @staticmethod
+    def unpack_direction(data):
+        return data[STATE.size - 2]
@@ -0,0 +1,271 @@
+# Таблица лидеров в SQLite.
+# База в режиме WAL: чтение экрана лидеров не блокирует запись результатов
+# турнира. Индекс (grid_size, score) обслуживает топ и страницы; страницы
+# выбираются по ключу (score, id) последней строки, а не через OFFSET.
+# Число партий, ранг и процентили считаются по score_counts — сколько партий
+# набрало каждый счёт — и score_buckets — то же по диапазонам в
+# 2^SCORE_BUCKET_BITS очков. Обе пополняются в той же транзакции, что и games,
+# и их размер зависит от разброса счетов, а не от числа партий: процентиль —
+# это проход по корзинам и по счетам одной корзины.
+# Партия из игры приходит с ключом game (путь реплея) и занимает одну строку:
+# если после отмены хода она закончится снова, строка обновится.
+#
+#   python leaderboard.py top --size 4 --limit 20
+#   python leaderboard.py stats --size 4
+import argparse
+import atexit
+import os
+import sqlite3
+import time
+from collections import Counter
+
+LEADERBOARD_FILE = os.path.join(os.path.expanduser("~"), ".2048_leaderboard.sqlite3")
+# Сколько результатов копить перед одной транзакцией записи
+INSERT_BATCH = 1000
+PAGE_SIZE = 10
+PERCENTILES = (0.5, 0.9, 0.99)
+SCORE_BUCKET_BITS = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    grid_size INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    max_tile INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    won INTEGER NOT NULL,
+    player TEXT NOT NULL,
+    played_at REAL NOT NULL,
+    game TEXT
+);
+CREATE INDEX IF NOT EXISTS games_size_score ON games (grid_size, score);
+CREATE TABLE IF NOT EXISTS score_counts (
+    grid_size INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (grid_size, score)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS score_buckets (
+    grid_size INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    PRIMARY KEY (grid_size, bucket)
+) WITHOUT ROWID;
+"""
+# PRAGMA user_version: с версии 1 есть счётчики, с версии 2 — ключ партии;
+# старые базы доводятся до текущей версии при открытии
+SCHEMA_VERSION = 2
+
+
+class Leaderboard:
+    def __init__(self, path=LEADERBOARD_FILE, batch_size=INSERT_BATCH):
+        self.path = path
+        self.batch_size = batch_size
+        self.pending = []
+        self.pending_games = {}
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        # В WAL потеря последних транзакций при сбое питания допустима, порча базы — нет
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self.migrate(version)
+        # Сводки по размерам поля; сбрасываются, когда базу меняет любой процесс
+        self.summaries = {}
+        self.data_version = None
+
+    def migrate(self, version):
+        with self.db:
+            if version < 1:
+                self.db.execute("DELETE FROM score_counts")
+                self.db.execute("DELETE FROM score_buckets")
+                self.db.execute("INSERT INTO score_counts (grid_size, score, games) "
+                                "SELECT grid_size, score, COUNT(*) FROM games GROUP BY grid_size, score")
+                self.db.execute("INSERT INTO score_buckets (grid_size, bucket, games) "
+                                f"SELECT grid_size, score >> {SCORE_BUCKET_BITS}, SUM(games) FROM score_counts "
+                                "GROUP BY 1, 2")
+            if version < 2:
+                columns = [row[1] for row in self.db.execute("PRAGMA table_info(games)")]
+                if "game" not in columns:
+                    self.db.execute("ALTER TABLE games ADD COLUMN game TEXT")
+                self.db.execute("CREATE UNIQUE INDEX IF NOT EXISTS games_game ON games (game) "
+                                "WHERE game IS NOT NULL")
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # --- запись ---
+
+    def add(self, grid_size, score, max_tile, moves, won, player="player", played_at=None, game=None):
+        # game — ключ партии: повторный add с тем же ключом заменяет её результат
+        row = (grid_size, score, max_tile, moves, int(bool(won)), player,
+               time.time() if played_at is None else played_at)
+        if game is None:
+            self.pending.append(row)
+        else:
+            self.pending_games[game] = row
+        if len(self.pending) + len(self.pending_games) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows):
+        # rows: (grid_size, score, max_tile, moves, won, player, played_at)
+        self.pending.extend(rows)
+        if len(self.pending) + len(self.pending_games) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending and not self.pending_games:
+            return
+        # Изменения счётчиков: +1 за каждый новый результат, -1 за заменённый
+        counts = Counter((row[0], row[1]) for row in self.pending)
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO games (grid_size, score, max_tile, moves, won, player, played_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", self.pending)
+            for game, row in self.pending_games.items():
+                old = self.db.execute("SELECT grid_size, score FROM games WHERE game = ?", (game,)).fetchone()
+                if old is None:
+                    self.db.execute(
+                        "INSERT INTO games (grid_size, score, max_tile, moves, won, player, played_at, game) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row + (game,))
+                else:
+                    counts[old] -= 1
+                    self.db.execute(
+                        "UPDATE games SET grid_size = ?, score = ?, max_tile = ?, moves = ?, won = ?, "
+                        "player = ?, played_at = ? WHERE game = ?", row + (game,))
+                counts[row[0], row[1]] += 1
+            buckets = Counter()
+            for (grid_size, score), n in counts.items():
+                buckets[grid_size, score >> SCORE_BUCKET_BITS] += n
+            self.db.executemany(
+                "INSERT INTO score_counts (grid_size, score, games) VALUES (?, ?, ?) "
+                "ON CONFLICT (grid_size, score) DO UPDATE SET games = games + excluded.games",
+                [(grid_size, score, n) for (grid_size, score), n in counts.items() if n])
+            self.db.executemany(
+                "INSERT INTO score_buckets (grid_size, bucket, games) VALUES (?, ?, ?) "
+                "ON CONFLICT (grid_size, bucket) DO UPDATE SET games = games + excluded.games",
+                [(grid_size, bucket, n) for (grid_size, bucket), n in buckets.items() if n])
+            # Счёт, которого больше ни у кого нет, не должен попасть в «best»
+            self.db.executemany("DELETE FROM score_counts WHERE grid_size = ? AND score = ? AND games = 0",
+                                [key for key, n in counts.items() if n < 0])
+        self.pending = []
+        self.pending_games = {}
+        self.summaries = {}
+
+    def close(self):
+        if self.db is None:
+            return
+        self.flush()
+        self.db.close()
+        self.db = None
+
+    # --- чтение ---
+
+    def page(self, grid_size, after=None, limit=PAGE_SIZE):
+        # after — (score, id) последней строки предыдущей страницы.
+        # Строки: (id, score, max_tile, moves, won, player, played_at)
+        self.flush()
+        if after is None:
+            cursor = self.db.execute(
+                "SELECT id, score, max_tile, moves, won, player, played_at FROM games "
+                "WHERE grid_size = ? ORDER BY score DESC, id DESC LIMIT ?", (grid_size, limit))
+        else:
+            cursor = self.db.execute(
+                "SELECT id, score, max_tile, moves, won, player, played_at FROM games "
+                "WHERE grid_size = ? AND (score < ? OR (score = ? AND id < ?)) "
+                "ORDER BY score DESC, id DESC LIMIT ?",
+                (grid_size, after[0], after[0], after[1], limit))
+        return cursor.fetchall()
+
+    def top(self, grid_size, limit=PAGE_SIZE):
+        return self.page(grid_size, None, limit)
+
+    def count(self, grid_size):
+        return self.summary(grid_size)["games"]
+
+    def rank(self, grid_size, score):
+        # Место результата score среди всех партий этого размера (с единицы)
+        self.flush()
+        bucket = score >> SCORE_BUCKET_BITS
+        higher = self.db.execute("SELECT SUM(games) FROM score_buckets WHERE grid_size = ? AND bucket > ?",
+                                 (grid_size, bucket)).fetchone()[0] or 0
+        higher += self.db.execute(
+            "SELECT SUM(games) FROM score_counts WHERE grid_size = ? AND score > ? AND score < ?",
+            (grid_size, score, (bucket + 1) << SCORE_BUCKET_BITS)).fetchone()[0] or 0
+        return higher + 1
+
+    def summary(self, grid_size, percentiles=PERCENTILES):
+        # Процентиль q — счёт партии номер int(q * N) по возрастанию счёта.
+        # Повторный вызов без записей в базу — из памяти
+        self.flush()
+        version = self.db.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.summaries = {}
+            self.data_version = version
+        key = (grid_size, tuple(percentiles))
+        result = self.summaries.get(key)
+        if result is not None:
+            return dict(result)
+        buckets = self.db.execute("SELECT bucket, games FROM score_buckets WHERE grid_size = ? ORDER BY bucket",
+                                  (grid_size,)).fetchall()
+        total = sum(games for _, games in buckets)
+        result = {"games": total}
+        if total:
+            result["best"] = self.db.execute("SELECT MAX(score) FROM score_counts WHERE grid_size = ?",
+                                             (grid_size,)).fetchone()[0]
+            targets = sorted((min(total - 1, int(q * total)), q) for q in percentiles)
+            seen = 0
+            i = 0
+            for bucket, games in buckets:
+                if i == len(targets):
+                    break
+                if targets[i][0] >= seen + games:
+                    seen += games
+                    continue
+                # В этой корзине есть нужные партии — проходим её счета
+                rows = self.db.execute(
+                    "SELECT score, games FROM score_counts WHERE grid_size = ? AND score >= ? AND score < ? "
+                    "ORDER BY score",
+                    (grid_size, bucket << SCORE_BUCKET_BITS, (bucket + 1) << SCORE_BUCKET_BITS))
+                for score, n in rows:
+                    seen += n
+                    while i < len(targets) and targets[i][0] < seen:
+                        result[f"p{round(targets[i][1] * 100)}"] = score
+                        i += 1
+        self.summaries[key] = result
+        return dict(result)
+
+
+_leaderboard = None
+
+
+def get_leaderboard():
+    # Одно соединение на процесс; при выходе накопленное дописывается
+    global _leaderboard
+    if _leaderboard is None:
+        _leaderboard = Leaderboard()
+        atexit.register(_leaderboard.close)
+    return _leaderboard
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Таблица лидеров 2048")
+    parser.add_argument("command", choices=["top", "stats"])
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=PAGE_SIZE)
+    parser.add_argument("--db", default=LEADERBOARD_FILE)
+    args = parser.parse_args(argv)
+    board = Leaderboard(args.db)
+    if args.command == "top":
+        for place, (_, score, max_tile, moves, won, player, played_at) in enumerate(
+                board.top(args.size, args.limit), 1):
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(played_at))
+            print(f"{place:>4}. {score:>8} {max_tile:>6} {moves:>6}  {player:<12} {when}")
+    else:
+        for key, value in board.summary(args.size).items():
+            print(f"{key}: {value}")
+    board.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+# Нагрузочный клиент для server.py: несколько соединений, на каждом много
+# партий, ходы отправляются пачками по одному на партию и ждут ответа.
+# В конце — ходов в секунду и задержка запроса (p50/p99/max).
+#
+#   python loadgen.py --connections 8 --sessions 500 --duration 10
+import argparse
+import asyncio
+import random
+import time
+
+from server import (REQUEST, RESPONSE, OP_NEW, OP_MOVE, OP_CLOSE, FLAG_MOVED, FLAG_WIN,
+                    FLAG_GAME_OVER, FLAG_ERROR, DEFAULT_HOST, DEFAULT_PORT, board_size)
+from stats import StreamingHistogram
+
+
+async def read_response(reader):
+    op, flags, grid_size, session_id, score = RESPONSE.unpack(await reader.readexactly(RESPONSE.size))
+    board = await reader.readexactly(board_size(grid_size)) if grid_size else b""
+    return op, flags, session_id, score, board
+
+
+async def client(args, latency, totals, deadline, seed):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+    rng = random.Random(seed)
+
+    writer.write(REQUEST.pack(OP_NEW, args.size, 0) * args.sessions)
+    sessions = []
+    for _ in range(args.sessions):
+        _, flags, session_id, _, _ = await read_response(reader)
+        if flags & FLAG_ERROR:
+            raise SystemExit("Сервер не создал партию")
+        sessions.append(session_id)
+
+    while time.perf_counter() < deadline:
+        # Один ход в каждую партию соединения одной записью в сокет
+        writer.write(b"".join(REQUEST.pack(OP_MOVE, rng.randrange(4), s) for s in sessions))
+        sent = time.perf_counter()
+        finished = []
+        for i in range(len(sessions)):
+            _, flags, session_id, _, _ = await read_response(reader)
+            latency.add((time.perf_counter() - sent) * 1e6)
+            totals["requests"] += 1
+            totals["moves"] += bool(flags & FLAG_MOVED)
+            if flags & (FLAG_WIN | FLAG_GAME_OVER):
+                finished.append(i)
+        if finished:
+            # Законченные партии закрываем и заменяем новыми
+            writer.write(b"".join(REQUEST.pack(OP_CLOSE, 0, sessions[i]) for i in finished)
+                         + REQUEST.pack(OP_NEW, args.size, 0) * len(finished))
+            for _ in finished:
+                await read_response(reader)
+            for i in finished:
+                _, _, sessions[i], _, _ = await read_response(reader)
+                totals["games"] += 1
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run(args):
+    latency = StreamingHistogram()
+    totals = {"requests": 0, "moves": 0, "games": 0}
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args, latency, totals, deadline, args.seed + i)
+                           for i in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    print(f"соединений: {args.connections}, партий: {args.connections * args.sessions}, {elapsed:.1f} с")
+    print(f"запросов/с: {totals['requests'] / elapsed:.0f}, ходов/с: {totals['moves'] / elapsed:.0f}, "
+          f"закончено партий: {totals['games']}")
+    print(f"задержка, мкс: p50={latency.percentile(50):.0f} p99={latency.percentile(99):.0f} "
+          f"max={latency.max or 0:.0f}")
+    return totals, latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузка на сервер 2048")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--connections", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=100, help="партий на соединение")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=2048)
+    asyncio.run(run(parser.parse_args(argv)))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,33 +1,60 @@
 import os
-import json
-import random
+import time
+from collections import deque
 from pyglet.graphics import Batch
 import arcade
 from arcade.gui import UIManager, UIFlatButton
-from arcade.gui.widgets.layout import UIAnchorLayout, UIBoxLayout
-from arcade import load_texture, SpriteSolidColor
-from arcade.gui.widgets.buttons import UIFlatButton
+from arcade.gui.widgets.layout import UIAnchorLayout
 
+from animation import MoveAnimation
+from engine import LEFT, RIGHT, UP, DOWN
+from metrics import get_metrics
+from game_core import GameCore, FOUR_PROBABILITY
+from history import History
+from replay import ReplayRecorder, REPLAY_DIR
+from renderer import BoardRenderer, TEXT_COLOR_LIGHT, TEXT_COLOR_DARK
+from storage import get_storage
+from text_cache import get_text_cache
 
 
 WINDOW_WIDTH = 720
 WINDOW_HEIGHT = 720
 FIELD_SCALE = 0.8
-CELL_PADDING = 6
 
 BACKGROUND_COLOR = (187, 173, 160)
 MENU_COLOR = (205, 173, 160)
-TILE_COLORS = {
-    0: (205, 193, 180), 2: (238, 228, 218), 4: (237, 224, 200),
-    8: (242, 177, 121), 16: (245, 149, 99), 32: (246, 124, 95),
-    64: (246, 94, 59), 128: (237, 207, 114), 256: (237, 204, 97),
-    512: (237, 200, 80), 1024: (237, 197, 63), 2048: (237, 194, 46)
-}
-BOX_COLOR = (119, 110, 101)
-TEXT_COLOR_LIGHT = arcade.color.WHITE
-TEXT_COLOR_DARK = arcade.color.BLACK
 
-BEST_SCORE_FILE = os.path.join(os.path.expanduser("~"), ".2048_best_score.json")
+KEY_DIRECTIONS = {
+    arcade.key.LEFT: LEFT, arcade.key.RIGHT: RIGHT,
+    arcade.key.UP: UP, arcade.key.DOWN: DOWN
+}
+DIRECTION_KEYS = {direction: key for key, direction in KEY_DIRECTIONS.items()}
+HINT_ARROWS = {LEFT: "←", RIGHT: "→", UP: "↑", DOWN: "↓"}
+# Клавиши, которые меняют партию: ставятся в очередь и применяются в on_update
+QUEUED_KEYS = set(KEY_DIRECTIONS) | {arcade.key.R, arcade.key.U, arcade.key.Y}
+# Время на поиск хода: подсказка по клавише H (всего, по HINT_FRAME_BUDGET
+# за кадр — кэш решателя сохраняется, и поиск углубляется от кадра к кадру)
+# и ход автоигры (клавиша A) за кадр
+HINT_TIME_BUDGET = 0.1
+HINT_FRAME_BUDGET = 0.012
+AUTOPLAY_TIME_BUDGET = 0.012
+# Ход из кэша позиций (position_cache.py) с такой глубиной просчёта
+# отдаётся сразу, без поиска
+HINT_REUSE_DEPTH = 3
+
+# Время на пересчёт статистики экрана «Шансы» (analytics.py) за кадр, с
+CHANCE_TIME_BUDGET = 0.008
+
+# Правые края числовых колонок и левые края текстовых на экране лидеров
+LEADERS_COLUMNS = (90, 200, 290, 370, 400, 560)
+
+# С этого размера поле считается ArrayCore (array_core.py)
+LARGE_BOARD_MIN_SIZE = 8
+LARGE_GRID_SIZES = (16, 32, 64)
+
+METRICS_FILE = os.path.join(os.path.expanduser("~"), ".2048_metrics.json")
+# Как часто обновлять текст оверлея замеров, с
+METRICS_REFRESH = 0.25
 
 
 class Game2048(arcade.View):
@@ -39,199 +66,312 @@ class Game2048(arcade.View):
         self.field_offset_x = (WINDOW_WIDTH - self.field_pixel_size) / 2
         self.field_offset_y = (WINDOW_HEIGHT - self.field_pixel_size) / 2
 
-        self.grid = self.create_empty_grid(grid_size)
-        self.score = 0
-        self.best_score = self.load_best_score()
-        self.game_over = False
-        self.win = False
-        self.spawn_initial_tiles(2)
-
-    def load_best_score(self):
-        try:
-            with open(BEST_SCORE_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return int(data.get("best_score", 0))
-        except Exception:
-            pass
+        self.recorder = ReplayRecorder(REPLAY_DIR)
+        # Большие поля — на массиве numpy; решатель для них не работает
+        self.large = grid_size >= LARGE_BOARD_MIN_SIZE
+        if self.large:
+            from array_core import ArrayCore
+            self.core = ArrayCore(grid_size)
+        else:
+            self.core = GameCore(grid_size)
+        self.core.recorder = self.recorder
+        # Ходы анимируются только на обычных полях: на больших за кадр меняются тысячи клеток
+        self.animated = not self.large
+        self.renderer = BoardRenderer(grid_size, self.cell_size, self.field_offset_x, self.field_offset_y,
+                                      self.field_pixel_size, self.animated)
+        self.storage = get_storage()
+        self.best_score = self.storage.best_score(grid_size)
+        if not self.resume_session():
+            # Новая партия начинается уже с записью реплея
+            self.core.reset()
+        self.history = History(self.core)
+        self.leaderboard = None
+        self.solver = None
+        self.hint = None
+        # Поле, для которого идёт подсказка, и сколько времени на неё осталось
+        self.hint_board = None
+        self.hint_time_left = 0.0
+        self.autoplay = False
+        # Нажатия копятся здесь и применяются в on_update все до одного;
+        # отрисовка анимирует только последний ход, предыдущие перематываются
+        self.input_queue = deque()
+        self.animation = None
+
+        # Замеры времени: F3 — оверлей, F4 — выгрузка в METRICS_FILE
+        self.metrics = get_metrics()
+        self.show_metrics = False
+        self.metrics_refresh = 0.0
+        self.metrics_batch = Batch()
+        self.metrics_texts = []
+        # Строка решателя пересобирается только при смене текста; надпись
+        # конца партии — спрайт из text_cache
+        self.solver_batch = Batch()
+        self.solver_text = arcade.Text("", WINDOW_WIDTH / 2, self.field_offset_y + self.field_pixel_size + 20,
+                                       TEXT_COLOR_DARK, 14, anchor_x="center", anchor_y="center",
+                                       batch=self.solver_batch)
+        self.end_sprites = arcade.SpriteList()
+        self.end_message = None
+
+    # Состояние игры хранится в GameCore, вид только читает его
+    @property
+    def grid(self):
+        return self.core.grid
+
+    @property
+    def score(self):
+        return self.core.score
+
+    @property
+    def game_over(self):
+        return self.core.game_over
+
+    @property
+    def win(self):
+        return self.core.win
+
+    def resume_session(self):
+        # Незаконченная партия этого размера продолжается с места выхода
+        session = self.storage.load_session(self.grid_size)
+        if not session or session.get("grid_size") != self.grid_size:
+            return False
+        self.core.restore(session)
+        if session.get("replay"):
+            self.recorder.resume(session["replay"], session.get("replay_moves", 0))
+        return True
 
     def save_best_score(self):
-        try:
-            with open(BEST_SCORE_FILE, "w", encoding="utf-8") as f:
-                json.dump({"best_score": int(self.best_score)}, f)
-        except Exception:
-            pass
-
-    def create_empty_grid(self, n):
-        return [[0] * n for _ in range(n)]
-
-    def spawn_initial_tiles(self, count=2):
-        n = self.grid_size ** 2
-        count = min(count, n)
-        indices = random.sample(range(n), count)
-        for idx in indices:
-            row, col = divmod(idx, self.grid_size)
-            self.grid[row][col] = 2
-
-    def spawn_one_tile(self):
-        empty = [(r, c) for r in range(self.grid_size) for c in range(self.grid_size) if self.grid[r][c] == 0]
-        if empty:
-            r, c = random.choice(empty)
-            self.grid[r][c] = 4 if random.random() < 0.1 else 2
+        # Запись на диск делает фоновый поток Storage
+        self.storage.update_best(self.grid_size, self.best_score)
 
-    @staticmethod
-    def compress_list_left(line):
-        nonzeros = [x for x in line if x]
-        return nonzeros + [0] * (len(line) - len(nonzeros))
-
-    @staticmethod
-    def merge_list_left(line):
-        nonzeros = [x for x in line if x]
-        merged, score = [], 0
-        i = 0
-        while i < len(nonzeros):
-            if i + 1 < len(nonzeros) and nonzeros[i] == nonzeros[i + 1]:
-                val = nonzeros[i] * 2
-                merged.append(val)
-                score += val
-                i += 2
-            else:
-                merged.append(nonzeros[i])
-                i += 1
-        return merged + [0] * (len(line) - len(merged)), score
+    def save_session(self):
+        if self.win or self.game_over:
+            self.storage.clear_session(self.grid_size)
+        else:
+            # Реплей дописывается на диск до сохранения: после падения
+            # в файле будут все ходы сохранённой партии
+            self.recorder.sync()
+            session = self.core.snapshot()
+            session["replay"] = self.recorder.path
+            session["replay_moves"] = self.recorder.moves
+            self.storage.save_session(self.grid_size, session)
 
     def move_left(self):
-        changed = False
-        score_gained = 0
-        for r in range(self.grid_size):
-            old = self.grid[r][:]
-            new, gained = self.merge_list_left(old)
-            if new != old:
-                changed = True
-                self.grid[r] = new
-                score_gained += gained
-        self.score += score_gained
-        return changed
+        return self.core.move_left()
 
     def move_right(self):
-        changed = False
-        score_gained = 0
-        for r in range(self.grid_size):
-            old = self.grid[r][:]
-            rev_old = old[::-1]
-            new_rev, gained = self.merge_list_left(rev_old)
-            new = new_rev[::-1]
-            if new != old:
-                changed = True
-                self.grid[r] = new
-                score_gained += gained
-        self.score += score_gained
-        return changed
+        return self.core.move_right()
 
     def move_up(self):
-        changed = False
-        score_gained = 0
-        for c in range(self.grid_size):
-            col = [self.grid[r][c] for r in range(self.grid_size)]
-            rev_col = col[::-1]
-            new_rev, gained = self.merge_list_left(rev_col)
-            new_col = new_rev[::-1]
-            if new_col != col:
-                changed = True
-                for r in range(self.grid_size):
-                    self.grid[r][c] = new_col[r]
-                score_gained += gained
-        self.score += score_gained
-        return changed
+        return self.core.move_up()
 
     def move_down(self):
-        changed = False
-        score_gained = 0
-        for c in range(self.grid_size):
-            col = [self.grid[r][c] for r in range(self.grid_size)]
-            new_col, gained = self.merge_list_left(col)
-            if new_col != col:
-                changed = True
-                for r in range(self.grid_size):
-                    self.grid[r][c] = new_col[r]
-                score_gained += gained
-        self.score += score_gained
-        return changed
-
-    def has_moves_possible(self):
-        for r in range(self.grid_size):
-            for c in range(self.grid_size):
-                if self.grid[r][c] == 0:
-                    return True
-                if c + 1 < self.grid_size and self.grid[r][c] == self.grid[r][c + 1]:
-                    return True
-                if r + 1 < self.grid_size and self.grid[r][c] == self.grid[r + 1][c]:
-                    return True
-        return False
+        return self.core.move_down()
+
+    def spawn_one_tile(self):
+        self.core.spawn_one_tile()
 
     def check_game_end(self):
-        for row in self.grid:
-            if 2048 in row:
-                self.win = True
-                if self.score > self.best_score or not os.path.exists(BEST_SCORE_FILE):
-                    self.best_score = self.score
-                    self.save_best_score()
-                return
-        if not self.has_moves_possible():
-            self.game_over = True
-            if self.score > self.best_score or not os.path.exists(BEST_SCORE_FILE):
-                self.best_score = self.score
-                self.save_best_score()
+        self.core.check_game_end()
+        if self.win or self.game_over:
+            self.record_result()
+
+    def record_result(self):
+        # Ключ строки в таблице лидеров — файл реплея: партия, законченная
+        # заново после отмены хода, обновляет свою строку, а не добавляет новую
+        if self.score > self.best_score:
+            self.best_score = self.score
+            self.save_best_score()
+        self.get_leaderboard().add(self.grid_size, self.score, self.core.max_tile(), self.recorder.moves, self.win,
+                                   game=self.recorder.path)
 
     def reset_game(self):
-        self.grid = self.create_empty_grid(self.grid_size)
-        self.score = 0
-        self.game_over = self.win = False
-        self.spawn_initial_tiles(2)
+        self.core.reset()
+        self.history.clear()
+        self.hint = None
+        self.autoplay = False
+        self.save_session()
+
+    def undo(self):
+        if self.history.undo() is None:
+            return
+        self.hint = None
+        self.autoplay = False
+        self.save_session()
 
-    def on_key_press(self, key, modifiers):
-        if key == arcade.key.R:
-            self.reset_game()
+    def redo(self):
+        if self.history.redo() is None:
             return
-        if self.game_over or self.win:
+        self.hint = None
+        # Повтор хода, которым партия закончилась, — снова конец партии
+        if self.win or self.game_over:
+            self.record_result()
+        self.save_session()
+
+    def get_leaderboard(self):
+        # sqlite3 и база открываются только к концу первой партии
+        if self.leaderboard is None:
+            from leaderboard import get_leaderboard
+            self.leaderboard = get_leaderboard()
+        return self.leaderboard
+
+    def get_solver(self):
+        # Решатель создаётся при первой подсказке: таблицы строк и кэш не нужны без неё.
+        # Кэш позиций общий с другими запусками и tournament.py; нет файла — работаем без него
+        if self.solver is None:
+            from solver import Expectimax
+            from position_cache import open_position_cache
+            self.solver = Expectimax(self.grid_size, positions=open_position_cache(self.grid_size),
+                                     reuse_depth=HINT_REUSE_DEPTH)
+        return self.solver
+
+    def show_hint(self):
+        # Поиск идёт в on_update по кусочку за кадр, чтобы не замораживать экран
+        self.get_solver()
+        self.hint_board = self.core.board
+        self.hint_time_left = HINT_TIME_BUDGET
+
+    def search_hint(self):
+        # После хода, отмены или новой партии подсказка к старому полю не нужна
+        if self.core.board != self.hint_board:
+            self.hint_time_left = 0.0
             return
-
-        moved = False
-        if key == arcade.key.LEFT:
-            moved = self.move_left()
-        elif key == arcade.key.RIGHT:
-            moved = self.move_right()
-        elif key == arcade.key.UP:
-            moved = self.move_up()
-        elif key == arcade.key.DOWN:
-            moved = self.move_down()
-
-        if moved:
-            # Спавним одну плитку
+        budget = min(HINT_FRAME_BUDGET, self.hint_time_left)
+        self.hint = self.solver.best_move(self.hint_board, budget)
+        self.hint_time_left -= budget
+
+    def make_move(self, direction):
+        metrics = self.metrics
+        undo_state = self.history.pack(direction)
+        with metrics.timer("move"):
+            moved = self.core.apply_move(direction)
+        if not moved:
+            return False
+        self.history.record(undo_state)
+        self.hint = None
+
+        # Спавним одну плитку
+        with metrics.timer("spawn"):
             self.spawn_one_tile()
 
-            # Обновляем best_score при необходимости и сохраняем
+        # Обновляем best_score при необходимости и сохраняем
+        with metrics.timer("persistence"):
             if self.score > self.best_score:
                 self.best_score = self.score
                 self.save_best_score()
 
-            # Проверяем окончание игры (победа/поражение)
+        # Проверяем окончание игры (победа/поражение)
+        with metrics.timer("end_check"):
             self.check_game_end()
+        with metrics.timer("persistence"):
+            self.save_session()
+        return True
+
+    def process_input(self):
+        # Применяет всё, что накопилось в очереди, по порядку
+        last_move = None
+        while self.input_queue:
+            key = self.input_queue.popleft()
+            if key in KEY_DIRECTIONS:
+                if self.game_over or self.win:
+                    continue
+                # Копия: GameCore меняет строки grid на месте
+                before = [value for row in self.grid for value in row] if self.animated else None
+                if self.make_move(KEY_DIRECTIONS[key]):
+                    last_move = (before, KEY_DIRECTIONS[key])
+                continue
+            last_move = None
+            self.finish_animation()
+            if key == arcade.key.R:
+                self.reset_game()
+            elif key == arcade.key.U:
+                self.undo()
+            elif key == arcade.key.Y:
+                self.redo()
+        if last_move is not None and self.animated:
+            self.start_animation(*last_move)
+
+    def start_animation(self, values_before, direction):
+        # Идущая анимация перематывается в конец, на экран — поле до этого хода
+        self.finish_animation()
+        self.renderer.update_values(values_before)
+        values_after = [value for row in self.grid for value in row]
+        self.animation = MoveAnimation.for_move(values_before, values_after, self.grid_size, direction)
+
+    def finish_animation(self):
+        if self.animation is not None:
+            self.renderer.settle(self.animation)
+            self.animation = None
+
+    def on_update(self, delta_time):
+        if self.show_metrics:
+            self.update_metrics_overlay(delta_time)
+        if self.animation is not None:
+            self.animation.advance(delta_time)
+        if self.autoplay and not (self.game_over or self.win) and not self.input_queue:
+            direction = self.get_solver().best_move(self.core.board, AUTOPLAY_TIME_BUDGET)
+            if direction is None:
+                self.autoplay = False
+            else:
+                self.input_queue.append(DIRECTION_KEYS[direction])
+        elif self.hint_time_left > 0 and not self.input_queue:
+            self.search_hint()
+        if self.input_queue:
+            with self.metrics.timer("input"):
+                self.process_input()
 
-            # Для отладки можно вывести сетку и счёт
-            print("Moved — current grid:")
-            for row in self.grid:
-                print(row)
-            print(f"Score: {self.score}  Best: {self.best_score}")
-
+    def on_key_press(self, key, modifiers):
+        self.metrics.mark_input()
+        if key == arcade.key.F3:
+            self.show_metrics = not self.show_metrics
+            self.metrics_refresh = 0.0
+            return
+        if key == arcade.key.F4:
+            self.metrics.export(METRICS_FILE)
+            return
         if key == arcade.key.ESCAPE:
-            menu_view = MenuView()
-            self.window.show_view(menu_view)
+            show_view(self.window, MenuView)
+            return
+        # Ходы, отмена и новая партия — через очередь, даже если нажаты
+        # быстрее кадра. Отмена работает и после конца партии
+        if key in QUEUED_KEYS:
+            self.input_queue.append(key)
+            return
+        if self.game_over or self.win:
+            return
+
+        if key == arcade.key.H and not self.large:
+            self.show_hint()
+        elif key == arcade.key.A and not self.large:
+            self.autoplay = not self.autoplay
+            if self.autoplay:
+                self.get_solver()
+
+    def on_hide_view(self):
+        # Нажатия, не дошедшие до on_update, не теряются
+        self.process_input()
+        self.finish_animation()
+        # Заголовок реплея дописывается, чтобы партию можно было продолжить
+        self.recorder.close()
+        # Результаты партий копятся пачкой; перед выходом в меню — в базу
+        if self.leaderboard is not None:
+            self.leaderboard.flush()
+
+    def on_show_view(self):
+        # Вид переиспользуется: после возврата из меню продолжаем запись реплея
+        if self.recorder.file is None and self.recorder.path and not (self.win or self.game_over):
+            self.recorder.resume(self.recorder.path, self.recorder.moves)
 
     def on_draw(self):
+        metrics = self.metrics
         self.clear()
         arcade.draw_lrbt_rectangle_filled(0, WINDOW_WIDTH, 0, WINDOW_HEIGHT, BACKGROUND_COLOR)
-        self.draw_board()
-        self.draw_score_boxes()
+        with metrics.timer("draw_board"):
+            self.draw_board()
+        with metrics.timer("draw_score_boxes"):
+            self.draw_score_boxes()
+        with metrics.timer("render"):
+            self.renderer.draw()
+        self.draw_solver_info()
 
         if self.win or self.game_over:
             # затемняющий полупрозрачный слой
@@ -242,44 +382,69 @@ class Game2048(arcade.View):
                 msg = 'Вы выиграли. Нажмите "R" чтобы попробовать снова'
             else:
                 msg = 'Вы проиграли. Нажмите "R" чтобы попробовать снова'
-            arcade.draw_text(msg, center_x, center_y, TEXT_COLOR_LIGHT, 24, anchor_x="center", anchor_y="center")
+            if msg != self.end_message:
+                self.end_message = msg
+                self.end_sprites.clear()
+                self.end_sprites.append(get_text_cache().sprite(msg, center_x, center_y, 24, TEXT_COLOR_LIGHT,
+                                                                anchor_x="center", anchor_y="center"))
+            self.end_sprites.draw()
+
+        if self.show_metrics:
+            self.metrics_batch.draw()
+        metrics.frame_done()
+
+    def update_metrics_overlay(self, delta_time):
+        # Текст оверлея пересобирается несколько раз в секунду, а не каждый кадр
+        self.metrics_refresh -= delta_time
+        if self.metrics_refresh > 0:
+            return
+        self.metrics_refresh = METRICS_REFRESH
+        lines = self.metrics.overlay_lines()
+        while len(self.metrics_texts) < len(lines):
+            y = WINDOW_HEIGHT - 14 - 14 * len(self.metrics_texts)
+            self.metrics_texts.append(arcade.Text("", 8, y, TEXT_COLOR_DARK, 10, batch=self.metrics_batch))
+        for text, line in zip(self.metrics_texts, lines):
+            if text.text != line:
+                text.text = line
 
     def draw_board(self):
-        tile_size = self.cell_size - CELL_PADDING
-        half_tile = tile_size / 2
-
-        for r in range(self.grid_size):
-            for c in range(self.grid_size):
-                # Центр клетки
-                x = self.field_offset_x + c * self.cell_size + self.cell_size / 2
-                y = self.field_offset_y + r * self.cell_size + self.cell_size / 2
-                value = self.grid[r][c]
-                color = TILE_COLORS.get(value, TILE_COLORS[2048])
-
-                arcade.draw_lbwh_rectangle_filled(x - half_tile, y - half_tile, tile_size, tile_size, color)
-
-                if value:
-                    font_size = max(24, int(self.cell_size * 0.45))
-                    text_color = TEXT_COLOR_DARK if value <= 4 else TEXT_COLOR_LIGHT
-                    arcade.draw_text(str(value), x, y, text_color, font_size,
-                                     anchor_x="center", anchor_y="center")
+        # Плитки и подписи живут в BoardRenderer, здесь — только изменившиеся клетки
+        animation = self.animation
+        if animation is not None:
+            if animation.sliding:
+                # Пока плитки едут, на экране поле до хода
+                self.renderer.slide(animation)
+                return
+            if animation.done:
+                self.finish_animation()
+            else:
+                self.renderer.pop(animation)
+        if self.large:
+            self.renderer.update_cells(self.core.cells)
+        else:
+            self.renderer.update_grid(self.grid)
+
+    def draw_solver_info(self):
+        # Подсказка и статистика решателя над полем
+        if self.hint is None and not self.autoplay:
+            return
+        parts = []
+        if self.autoplay:
+            parts.append("Автоигра")
+        if self.hint is not None:
+            parts.append(f"Подсказка: {HINT_ARROWS[self.hint]}")
+        if self.solver is not None:
+            stats = self.solver.stats()
+            parts.append(f"глубина {stats['depth']}, {stats['nodes_per_sec']:.0f} узл/с, "
+                         f"кэш {stats['cache_hit_rate']:.0%}")
+        line = "  ".join(parts)
+        if self.solver_text.text != line:
+            self.solver_text.text = line
+        self.solver_batch.draw()
 
     def draw_score_boxes(self):
         # Нарисовать два бокса Score и BestScore под полем (слева)
-        box_w = self.field_pixel_size * 0.45
-        box_h = 50
-        left_x = self.field_offset_x + box_w / 2
-        bottom_y = self.field_offset_y - box_h - 10
-
-        # Score
-        arcade.draw_rect_filled(arcade.rect.XYWH(left_x, bottom_y + box_h / 2, box_w, box_h), BOX_COLOR)
-        arcade.draw_text(f"Score: {self.score}", left_x, bottom_y + box_h / 2, TEXT_COLOR_LIGHT, 20, anchor_x="center",
-                         anchor_y="center")
-
-        # Best
-        arcade.draw_rect_filled(arcade.rect.XYWH(left_x + box_w + 10, bottom_y + box_h / 2, box_w, box_h), BOX_COLOR)
-        arcade.draw_text(f"Best: {self.best_score}", left_x + box_w + 10, bottom_y + box_h / 2, TEXT_COLOR_LIGHT, 20,
-                         anchor_x="center", anchor_y="center")
+        self.renderer.update_scores(self.score, self.best_score)
 
 
 class MenuView(arcade.View):
@@ -295,22 +460,22 @@ class MenuView(arcade.View):
         self.setup_title()
 
     def setup_title(self):
-        title_color = (14, 33, 75)
-        self.main_text = arcade.Text(
+        # Заголовок с обводкой растеризуется один раз (text_cache) и рисуется
+        # одним спрайтом на строку
+        self.title_sprites = arcade.SpriteList()
+        self.add_text_outline(
             "2048", self.window.width / 2, self.window.height - 120,
-            title_color, 60, font_name=self.comic_font, anchor_x="center", bold=True
+            (14, 33, 75), 72, outline_color=arcade.color.WHITE, outline_width=4
         )
-        self.space_text = arcade.Text(
-            "Выбери поле, чтобы начать!", self.window.width / 2, self.window.height - 180,
-            title_color, 30, font_name=self.comic_font, anchor_x="center"
+        self.add_text_outline(
+            "Выбери поле, чтобы начать!", self.window.width / 2, self.window.height - 200,
+            (14, 33, 75), 22, outline_color=arcade.color.WHITE, outline_width=2
         )
 
-    def draw_text_outline(self, text, x, y, color, font_size, outline_color=arcade.color.WHITE, outline_width=3):
-        for dx in range(-outline_width, outline_width + 1):
-            for dy in range(-outline_width, outline_width + 1):
-                if dx != 0 or dy != 0:
-                    arcade.draw_text(text, x + dx, y + dy + 30, outline_color, font_size, font_name=self.comic_font, anchor_x="center", anchor_y="center")
-        arcade.draw_text(text, x, y + 30, color, font_size, font_name=self.comic_font, anchor_x="center", anchor_y="center")
+    def add_text_outline(self, text, x, y, color, font_size, outline_color=arcade.color.WHITE, outline_width=3):
+        self.title_sprites.append(get_text_cache().sprite(
+            text, x, y + 30, font_size, color, anchor_x="center", anchor_y="center", font_name=self.comic_font,
+            outline_color=outline_color, outline_width=outline_width))
 
     def setup_widgets(self):
         self.flat_button_4 = UIFlatButton(text="4x4", width=320, height=75, text_color=arcade.color.WHITE, bg_color=arcade.color.BLUE)
@@ -321,10 +486,10 @@ class MenuView(arcade.View):
             anchor_y="top",  # Якорь по Y: bottom, center_y или top
             align_y=-250  # Смещение по Y в пикселях от якоря (отрицательное — вниз)
         )
-        self.flat_button_4.on_click = lambda e, s=4: self.window.show_view(Game2048(s))
+        self.flat_button_4.on_click = lambda e, s=4: show_view(self.window, Game2048, s)
 
         self.flat_button_5 = UIFlatButton(text="5x5", width=320, height=75, color=arcade.color.BLUE)
-        self.flat_button_5.on_click = lambda e, s=5: self.window.show_view(Game2048(s))
+        self.flat_button_5.on_click = lambda e, s=5: show_view(self.window, Game2048, s)
         self.anchor_layout.add(
             self.flat_button_5,
             anchor_x="center_x",  # Якорь по X: левый край, центр или правый
@@ -334,7 +499,7 @@ class MenuView(arcade.View):
         )
 
         self.flat_button_7 = UIFlatButton(text="7x7", width=320, height=75, color=arcade.color.BLUE)
-        self.flat_button_7.on_click = lambda e, s=7: self.window.show_view(Game2048(s))
+        self.flat_button_7.on_click = lambda e, s=7: show_view(self.window, Game2048, s)
         self.anchor_layout.add(
             self.flat_button_7,
             anchor_x="center_x",  # Якорь по X: левый край, центр или правый
@@ -343,6 +508,15 @@ class MenuView(arcade.View):
             align_y=-450  # Смещение по Y в пикселях от якоря (отрицательное — вниз)
         )
 
+        # Большие поля для стресс-тестов и исследований — маленькие кнопки в ряд
+        self.large_buttons = []
+        for i, size in enumerate(LARGE_GRID_SIZES):
+            button = UIFlatButton(text=f"{size}x{size}", width=100, height=45, color=arcade.color.BLUE)
+            button.on_click = lambda e, s=size: show_view(self.window, Game2048, s)
+            self.anchor_layout.add(button, anchor_x="center_x", align_x=(i - 1) * 110,
+                                   anchor_y="top", align_y=-535)
+            self.large_buttons.append(button)
+
         self.flat_button_lider = UIFlatButton(text='Лидеры', width=150, height=60, font='Comic Sans MS',
                                               color=arcade.color.BLUE)
         self.anchor_layout.add(
@@ -352,6 +526,7 @@ class MenuView(arcade.View):
             anchor_y="top",  # Якорь по Y: bottom, center_y или top
             align_y=-600  # Смещение по Y в пикселях от якоря (отрицательное — вниз)
         )
+        self.flat_button_lider.on_click = lambda event: show_view(self.window, Leaders)
 
 
         self.flat_button_rules = UIFlatButton(text="Правила", width=150, height=60, color=arcade.color.BLUE)
@@ -362,7 +537,7 @@ class MenuView(arcade.View):
             anchor_y="top",  # Якорь по Y: bottom, center_y или top
             align_y=-600  # Смещение по Y в пикселях от якоря (отрицательное — вниз)
         )
-        self.flat_button_rules.on_click = lambda event: self.window.show_view(Rules())
+        self.flat_button_rules.on_click = lambda event: show_view(self.window, Rules)
 
         self.flat_button_odds = UIFlatButton(text="Шансы", width=150, height=60, color=arcade.color.BLUE)
         self.anchor_layout.add(
@@ -372,7 +547,7 @@ class MenuView(arcade.View):
             anchor_y="top",  # Якорь по Y: bottom, center_y или top
             align_y=-600  # Смещение по Y в пикселях от якоря (отрицательное — вниз)
         )
-        self.flat_button_odds.on_click = lambda event: self.window.show_view(Chance())
+        self.flat_button_odds.on_click = lambda event: show_view(self.window, Chance)
 
     def on_show_view(self):
         self.manager.enable()
@@ -383,15 +558,7 @@ class MenuView(arcade.View):
     def on_draw(self):
         self.clear()
         self.manager.draw()
-
-        self.draw_text_outline(
-            "2048", self.window.width / 2, self.window.height - 120,
-            (14, 33, 75), 72, outline_color=arcade.color.WHITE, outline_width=4
-        )
-        self.draw_text_outline(
-            "Выбери поле, чтобы начать!", self.window.width / 2, self.window.height - 200,
-            (14, 33, 75), 22, outline_color=arcade.color.WHITE, outline_width=2
-        )
+        self.title_sprites.draw()
 
 
 class Rules(arcade.View):
@@ -402,6 +569,7 @@ class Rules(arcade.View):
         self.anchor_layout = UIAnchorLayout()
         self.manager.add(self.anchor_layout)
         self.setup_widgets()
+        self.setup_texts()
 
     def setup_widgets(self):
         back_btn = UIFlatButton(
@@ -413,7 +581,7 @@ class Rules(arcade.View):
             color=(205, 193, 180),
             text_color=(14, 33, 75)
         )
-        back_btn.on_click = lambda event: self.window.show_view(MenuView())
+        back_btn.on_click = lambda event: show_view(self.window, MenuView)
 
 
         self.anchor_layout.add(back_btn, anchor_x="center_x", anchor_y="center_y", align_x=200, align_y= -300)
@@ -423,12 +591,17 @@ class Rules(arcade.View):
         arcade.draw_lrbt_rectangle_filled(0, WINDOW_WIDTH, 0, WINDOW_HEIGHT, (205, 193, 180))
 
         self.manager.draw()
+        self.texts.draw()
 
-        arcade.draw_text("Правила игры 2048:", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 75,
-                         (14, 33, 75), 32, anchor_x="center", font_name=self.comic_font)
+    def setup_texts(self):
+        # Тексты экрана растеризуются один раз (text_cache) и рисуются одним SpriteList
+        text = get_text_cache().sprite
+        self.texts = arcade.SpriteList()
+        self.texts.append(text("Правила игры 2048:", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 75,
+                               32, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
 
         y_pos = WINDOW_HEIGHT - 350
-        arcade.draw_text(
+        self.texts.append(text(
             "• Игровое поле имеет форму квадрата 4×4 / 5x5 / 7x7.В начале игры появляются две плитки номинала «2» или «4».\n"
             "•Нажатием стрелки игрок может скинуть все плитки игрового поля в одну из четырёх сторон.\n"
             "•Если при сбрасывании две плитки одного номинала «налетают» одна на другую, то они превращаются в одну, номинал которой равен сумме соединившихся плиток.\n"
@@ -438,39 +611,46 @@ class Rules(arcade.View):
             "•За каждое соединение игровые очки увеличиваются на номинал получившейся плитки.\n"
             "•Игра заканчивается поражением, если после очередного хода невозможно совершить действие.",
             WINDOW_WIDTH / 2, y_pos,
-            (14, 33, 75), 14,
+            14, (14, 33, 75),
             anchor_x="center", anchor_y="center",
             font_name=self.comic_font,
-            multiline=True,
             width=600
-        )
-
-
-        arcade.draw_text("Нажмите ESC или кнопку 'Назад'", 230, 50,
-                         (14, 33, 75), 20, anchor_x="center", font_name=self.comic_font)
-
-
+        ))
+        self.texts.append(text("Нажмите ESC или кнопку 'Назад'", 230, 50,
+                               20, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
 
     def on_show_view(self):
         self.manager.enable()
-        arcade.set_background_color(205, 193, 180)
 
     def on_hide_view(self):
         self.manager.disable()
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.ESCAPE:
-            self.window.show_view(MenuView())
+            show_view(self.window, MenuView)
 
 
 class Chance(arcade.View):
+    # Правила появления плиток и то, что получается на деле: доля четвёрок
+    # в ваших партиях (реплеи) и в симуляции, которая идёт, пока открыт экран
     def __init__(self):
         super().__init__()
         self.manager = UIManager()
         self.comic_font = "Comic Sans MS"
         self.anchor_layout = UIAnchorLayout()
         self.manager.add(self.anchor_layout)
+        # analytics тянет numpy — импорт при создании экрана, а не при старте игры
+        # и не в каждом кадре
+        from analytics import Analytics, GRID_SIZES, interleave, run, simulate
+        self.grid_sizes = GRID_SIZES
+        self.run_steps = run
+        self.played = Analytics()
+        self.replay_steps = None
+        self.simulated = Analytics()
+        self.simulation_steps = interleave(simulate(self.simulated, size) for size in GRID_SIZES)
+        self.text_refresh = 0.0
         self.setup_widgets()
+        self.setup_texts()
 
     def setup_widgets(self):
         back_btn = UIFlatButton(
@@ -482,7 +662,7 @@ class Chance(arcade.View):
             color=(205, 193, 180),
             text_color=(14, 33, 75)
         )
-        back_btn.on_click = lambda event: self.window.show_view(MenuView())
+        back_btn.on_click = lambda event: show_view(self.window, MenuView)
 
 
         self.anchor_layout.add(back_btn, anchor_x="center_x", anchor_y="center_y", align_x=200, align_y= -300)
@@ -492,36 +672,230 @@ class Chance(arcade.View):
         arcade.draw_lrbt_rectangle_filled(0, WINDOW_WIDTH, 0, WINDOW_HEIGHT, (205, 193, 180))
 
         self.manager.draw()
-
+        self.texts.draw()
+        self.batch.draw()
+
+    def setup_texts(self):
+        # Неизменные тексты растеризуются один раз (text_cache) и рисуются одним
+        # SpriteList, цифры статистики — arcade.Text в одном Batch
+        text = get_text_cache().sprite
+        self.texts = arcade.SpriteList()
         # Заголовок
-        arcade.draw_text("Шансы появления плиток:", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 100,
-                         (14, 33, 75), 32, anchor_x="center", font_name=self.comic_font)
+        self.texts.append(text("Шансы появления плиток:", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 100,
+                               32, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
+
+        # Правила: стартовые плитки всегда 2, дальше 4 выпадает с FOUR_PROBABILITY
+        y_pos = WINDOW_HEIGHT - 180
+        self.texts.append(text(f"• {1 - FOUR_PROBABILITY:.0%} — новая плитка со значением 2", WINDOW_WIDTH / 2,
+                               y_pos, 24, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
+        self.texts.append(text(f"• {FOUR_PROBABILITY:.0%} — новая плитка со значением 4", WINDOW_WIDTH / 2,
+                               y_pos - 45, 24, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
+
+        self.texts.append(text("Нажмите ESC или кнопку 'Назад'", 230, 50,
+                               20, (14, 33, 75), anchor_x="center", font_name=self.comic_font))
+
+        self.batch = Batch()
+
+        def line(y, size=16):
+            return arcade.Text("", 40, y, (14, 33, 75), size, font_name=self.comic_font, batch=self.batch)
+
+        self.played_text = line(y_pos - 110)
+        self.simulated_text = line(y_pos - 140)
+        self.size_texts = {}
+        for i, size in enumerate(self.grid_sizes):
+            y = y_pos - 195 - 62 * i
+            self.size_texts[size] = (line(y), line(y - 26, 14))
+        self.update_texts()
+
+    @staticmethod
+    def ratio_line(title, stats):
+        if not stats.spawns:
+            return f"{title}: новых плиток пока нет"
+        # ± — половина 95% доверительного интервала
+        low, high = stats.four_ratio_interval()
+        return f"{title}: четвёрок {stats.four_ratio():.2%} ± {(high - low) / 2:.2%}, плиток {stats.spawns}"
+
+    def update_texts(self):
+        # Пока реплеи считаются впервые, показываем промежуточный итог
+        played = self.played if self.played.sizes or self.replay_steps is None else self.replay_analytics
+        self.played_text.text = self.ratio_line("Ваши партии", played.total())
+        self.simulated_text.text = self.ratio_line("Симуляция", self.simulated.total())
+        for size, (score_text, tiles_text) in self.size_texts.items():
+            stats = self.simulated.size(size)
+            if not stats.games:
+                score_text.text = f"{size}x{size}: партии идут, ходов: {stats.spawns}"
+                tiles_text.text = ""
+                continue
+            scores = stats.scores
+            score_text.text = (f"{size}x{size}: {stats.games} партий, счёт p50 {scores.percentile(50):.0f}, "
+                               f"p90 {scores.percentile(90):.0f}, p99 {scores.percentile(99):.0f}")
+            tiles_text.text = "макс. плитка: " + ", ".join(
+                f"{tile} — {share:.0%}" for tile, share in stats.top_tiles())
+
+    def on_update(self, delta_time):
+        # Сначала реплеи, на остаток бюджета кадра — симуляция
+        run = self.run_steps
+        started = time.perf_counter()
+        if self.replay_steps is not None and not run(self.replay_steps, CHANCE_TIME_BUDGET):
+            self.played = self.replay_analytics
+            self.replay_steps = None
+        left = CHANCE_TIME_BUDGET - (time.perf_counter() - started)
+        if left > 0:
+            run(self.simulation_steps, left)
+        self.text_refresh -= delta_time
+        if self.text_refresh <= 0:
+            self.text_refresh = METRICS_REFRESH
+            self.update_texts()
+
+    def on_show_view(self):
+        # Реплеи пересчитываются при каждом показе: могли добавиться партии.
+        # Пока пересчёт идёт, на экране прежние цифры
+        from analytics import Analytics, replays
+        if self.replay_steps is None:
+            self.replay_analytics = Analytics()
+            self.replay_steps = replays(self.replay_analytics, [REPLAY_DIR])
+        self.manager.enable()
+
+    def on_hide_view(self):
+        self.manager.disable()
+
+    def on_key_press(self, key, modifiers):
+        if key == arcade.key.ESCAPE:
+            show_view(self.window, MenuView)
+
+
+class Leaders(arcade.View):
+    # Таблица лидеров: одна страница из page_size строк за запрос, листание
+    # по ключу последней строки, вся таблица в память не загружается
+    def __init__(self, grid_size=4):
+        super().__init__()
+        self.manager = UIManager()
+        self.comic_font = "Comic Sans MS"
+        self.anchor_layout = UIAnchorLayout()
+        self.manager.add(self.anchor_layout)
+        from leaderboard import get_leaderboard, PAGE_SIZE
+        self.leaderboard = get_leaderboard()
+        self.page_size = PAGE_SIZE
+        self.grid_size = grid_size
+        self.batch = Batch()
+        self.title = arcade.Text("", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 75, (14, 33, 75), 32,
+                                 anchor_x="center", font_name=self.comic_font, batch=self.batch)
+        self.summary_text = arcade.Text("", WINDOW_WIDTH / 2, WINDOW_HEIGHT - 115, (14, 33, 75), 16,
+                                        anchor_x="center", font_name=self.comic_font, batch=self.batch)
+        # Колонки: место, счёт, плитка, ходы, игрок, дата
+        header = ("№", "Счёт", "Плитка", "Ходы", "Игрок", "Дата")
+        self.rows = []
+        for i in range(self.page_size + 1):
+            y = WINDOW_HEIGHT - 200 - 36 * i
+            self.rows.append([arcade.Text(header[j] if i == 0 else "", x, y, (14, 33, 75), 16,
+                                          anchor_x="right" if j < 4 else "left",
+                                          font_name=self.comic_font, batch=self.batch)
+                              for j, x in enumerate(LEADERS_COLUMNS)])
+        self.header = self.rows.pop(0)
+        self.footer = arcade.Text("Стрелки ←/→ — страницы, ESC — назад", 230, 50, (14, 33, 75), 16,
+                                  anchor_x="center", font_name=self.comic_font, batch=self.batch)
+        self.setup_widgets()
+
+    def setup_widgets(self):
+        for i, size in enumerate((4, 5, 7)):
+            button = UIFlatButton(text=f"{size}x{size}", width=100, height=40, color=arcade.color.BLUE)
+            button.on_click = lambda event, s=size: self.select_size(s)
+            self.anchor_layout.add(button, anchor_x="center_x", anchor_y="top", align_x=(i - 1) * 110, align_y=-135)
+
+        back_btn = UIFlatButton(
+            text="Назад",
+            width=200,
+            height=60,
+            font_size=24,
+            font_name="Comic Sans MS",
+            color=(205, 193, 180),
+            text_color=(14, 33, 75)
+        )
+        back_btn.on_click = lambda event: show_view(self.window, MenuView)
+        self.anchor_layout.add(back_btn, anchor_x="center_x", anchor_y="center_y", align_x=200, align_y=-300)
 
-        # Информация о шансах
-        y_pos = WINDOW_HEIGHT / 2 + 50
-        arcade.draw_text("• 75% — новая плитка со значением 2", WINDOW_WIDTH / 2, y_pos,
-                         (14, 33, 75), 28, anchor_x="center", font_name=self.comic_font)
-        arcade.draw_text("• 25% — новая плитка со значением 4", WINDOW_WIDTH / 2, y_pos - 80,
-                         (14, 33, 75), 28, anchor_x="center", font_name=self.comic_font)
+    def select_size(self, grid_size):
+        self.grid_size = grid_size
+        # Стек ключей начала страниц: назад листаем без повторного поиска
+        self.cursors = [None]
+        self.title.text = f"Лидеры {grid_size}x{grid_size}"
+        summary = self.leaderboard.summary(grid_size)
+        if summary["games"]:
+            self.summary_text.text = (f"Партий: {summary['games']}  p50: {summary['p50']}  "
+                                      f"p90: {summary['p90']}  p99: {summary['p99']}")
+        else:
+            self.summary_text.text = "Партий пока нет"
+        self.load_page()
+
+    def load_page(self):
+        self.page = self.leaderboard.page(self.grid_size, self.cursors[-1])
+        first_place = (len(self.cursors) - 1) * self.page_size + 1
+        for i, texts in enumerate(self.rows):
+            if i < len(self.page):
+                _, score, max_tile, moves, won, player, played_at = self.page[i]
+                when = time.strftime("%d.%m.%Y", time.localtime(played_at))
+                values = (f"{first_place + i}.", score, max_tile, moves, player, when)
+            else:
+                values = ("",) * len(texts)
+            for text, value in zip(texts, values):
+                text.text = str(value)
 
-        arcade.draw_text("Нажмите ESC или кнопку 'Назад'", 230, 50,
-                         (14, 33, 75), 20, anchor_x="center", font_name=self.comic_font)
+    def next_page(self):
+        if len(self.page) < self.page_size:
+            return
+        last = self.page[-1]
+        self.cursors.append((last[1], last[0]))
+        self.load_page()
+        if not self.page:
+            self.prev_page()
 
+    def prev_page(self):
+        if len(self.cursors) > 1:
+            self.cursors.pop()
+            self.load_page()
 
+    def on_draw(self):
+        self.clear()
+        arcade.draw_lrbt_rectangle_filled(0, WINDOW_WIDTH, 0, WINDOW_HEIGHT, (205, 193, 180))
+        self.manager.draw()
+        self.batch.draw()
 
     def on_show_view(self):
+        # Вид переиспользуется, а партии за это время могли добавиться
+        self.select_size(self.grid_size)
         self.manager.enable()
-        arcade.set_background_color(205, 193, 180)
 
     def on_hide_view(self):
         self.manager.disable()
 
     def on_key_press(self, key, modifiers):
         if key == arcade.key.ESCAPE:
-            self.window.show_view(MenuView())
+            show_view(self.window, MenuView)
+        elif key == arcade.key.RIGHT:
+            self.next_page()
+        elif key == arcade.key.LEFT:
+            self.prev_page()
+
+
+def show_view(window, view_class, *args):
+    # Каждый вид создаётся один раз на окно и дальше переиспользуется вместе
+    # со своим UIManager и раскладкой; Game2048 — отдельно на каждый размер поля
+    cache = getattr(window, "view_cache", None)
+    if cache is None:
+        cache = window.view_cache = {}
+    key = (view_class, args)
+    view = cache.get(key)
+    if view is None:
+        view = cache[key] = view_class(*args)
+    window.show_view(view)
+    return view
+
+
+def main():
+    window = arcade.Window(WINDOW_WIDTH, WINDOW_HEIGHT, "2048 - Меню")
+    show_view(window, MenuView)
+    arcade.run()
 
 
-window = arcade.Window(WINDOW_WIDTH, WINDOW_HEIGHT, "2048 - Меню")
-menu_view = MenuView()
-window.show_view(menu_view)
-arcade.run()
+if __name__ == "__main__":
+    main()
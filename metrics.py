@@ -0,0 +1,135 @@
+# Замеры времени внутри игры: фазы хода и кадра, время кадра и задержка
+# от нажатия клавиши до конца кадра, в котором виден результат.
+# Храним последние WINDOW замеров каждой величины, процентили считаются
+# только по запросу (оверлей, экспорт).
+import json
+import time
+from collections import deque
+
+WINDOW = 600
+# Корзины гистограммы для экспорта, мс
+HISTOGRAM_EDGES_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 50, 100, 250)
+
+
+class RollingHistogram:
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        values = sorted(self.samples)
+        if not values:
+            return {"count": self.count}
+
+        def pick(q):
+            return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+        return {
+            "count": self.count,
+            "mean_ms": sum(values) / len(values) * 1000,
+            "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95),
+            "p99_ms": pick(0.99),
+            "max_ms": values[-1] * 1000,
+        }
+
+    def histogram(self):
+        buckets = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+        for value in self.samples:
+            ms = value * 1000
+            i = 0
+            while i < len(HISTOGRAM_EDGES_MS) and ms > HISTOGRAM_EDGES_MS[i]:
+                i += 1
+            buckets[i] += 1
+        return buckets
+
+
+class PhaseTimer:
+    # with metrics.timer("move"): ... — один объект на фазу, без аллокаций
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.add(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.phases = {}
+        self.timers = {}
+        self.frames = RollingHistogram(window)
+        self.input_latency = RollingHistogram(window)
+        self.last_frame = None
+        self.pending_input = None
+
+    def timer(self, name):
+        timer = self.timers.get(name)
+        if timer is None:
+            histogram = self.phases[name] = RollingHistogram(self.window)
+            timer = self.timers[name] = PhaseTimer(histogram)
+        return timer
+
+    def mark_input(self):
+        # Запоминаем самое раннее необработанное нажатие
+        if self.pending_input is None:
+            self.pending_input = time.perf_counter()
+
+    def frame_done(self):
+        now = time.perf_counter()
+        if self.last_frame is not None:
+            self.frames.add(now - self.last_frame)
+        self.last_frame = now
+        if self.pending_input is not None:
+            self.input_latency.add(now - self.pending_input)
+            self.pending_input = None
+
+    def summary(self):
+        return {
+            "frame": self.frames.summary(),
+            "input_to_frame": self.input_latency.summary(),
+            "phases": {name: h.summary() for name, h in sorted(self.phases.items())},
+        }
+
+    def export(self, path):
+        data = self.summary()
+        data["histogram_edges_ms"] = list(HISTOGRAM_EDGES_MS)
+        data["histograms"] = {
+            "frame": self.frames.histogram(),
+            "input_to_frame": self.input_latency.histogram(),
+        }
+        data["histograms"].update({name: h.histogram() for name, h in self.phases.items()})
+        data["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    def overlay_lines(self):
+        lines = []
+        for title, summary in (("кадр", self.frames.summary()), ("ввод→кадр", self.input_latency.summary())):
+            if "mean_ms" in summary:
+                lines.append(f"{title}: {summary['mean_ms']:.2f} мс, p99 {summary['p99_ms']:.2f} мс")
+        for name, histogram in sorted(self.phases.items()):
+            summary = histogram.summary()
+            if "mean_ms" in summary:
+                lines.append(f"{name}: {summary['mean_ms']:.3f} мс, p99 {summary['p99_ms']:.3f} мс")
+        return lines
+
+
+_metrics = None
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,339 @@
+# Общий для процессов кэш позиций решателя: хеш-таблица в файле через mmap.
+# Ключ — каноническое поле (engine.canonical), значение — глубина просчёта,
+# оценка и, для корня поиска, лучший ход (в ориентации канонического поля).
+# Таблица разбита на корзины по WAYS записей; запись не пересекает корзину.
+# Писатели берут fcntl-блокировку диапазона одной корзины, читатели идут без
+# блокировок: у записи есть контрольная сумма, недописанная запись — промах.
+# Размер файла задаётся при создании и дальше не растёт. Вытесняется самая
+# старая запись корзины, при равном возрасте — с меньшей глубиной.
+# Файл одного размера поля; при смене весов эвристики (отпечаток в заголовке)
+# таблица очищается.
+#
+#   python position_cache.py warm --size 4 --replays ~/.2048_replays
+#   python position_cache.py warm --size 4 --games 20 --depth 3 --workers 4
+#   python position_cache.py stats --size 4
+#   python position_cache.py preload --size 4   — прочитать файл в кэш ОС
+import argparse
+import mmap
+import os
+import struct
+import time
+import zlib
+from contextlib import contextmanager
+from multiprocessing import Pool, cpu_count
+
+from engine import get_engine
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: без блокировок, испорченные гонкой записи отсекает контрольная сумма
+    fcntl = None
+
+POSITION_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".2048_positions_{}.bin")
+POSITION_CACHE_BYTES = 64 * 1024 * 1024
+MAGIC = b"2048POS1"
+# magic, размер поля, длина ключа, длина записи, log2 числа корзин, отпечаток эвристики
+HEADER = struct.Struct("<8sBBHBxxxQ")
+HEADER_SIZE = 64
+WAYS = 4
+NO_MOVE = 255
+# Корни и узлы ожидания с одним полем попадают в разные корзины
+ROOT_SALT = 0x5BD1E9955BD1E995
+GOLDEN = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+# Возраст записи считается в минутах, по модулю 2^16
+STAMP_SECONDS = 60
+
+
+def fold(key):
+    # Поле любой ширины -> 64 бита
+    h = 0
+    while key:
+        h ^= key & MASK64
+        key >>= 64
+    return h
+
+
+def stamp():
+    return int(time.time() // STAMP_SECONDS) & 0xFFFF
+
+
+class PositionCache:
+    def __init__(self, path, grid_size, max_bytes=POSITION_CACHE_BYTES, fingerprint=0):
+        self.path = path
+        self.grid_size = grid_size
+        self.fingerprint = fingerprint
+        self.key_bytes = (get_engine(grid_size).board_bytes + 7) // 8 * 8
+        # ключ, оценка, глубина, ход, возраст, контрольная сумма
+        self.entry = struct.Struct(f"<{self.key_bytes}sdBBHI")
+        self.bucket_bytes = self.entry.size * WAYS
+        bits = max(1, ((max_bytes - HEADER_SIZE) // self.bucket_bytes).bit_length() - 1)
+
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            with self.locked(0, HEADER_SIZE):
+                bits = self.open_header(bits)
+            self.bucket_bits = bits
+            self.size = HEADER_SIZE + (self.bucket_bytes << bits)
+            self.mmap = mmap.mmap(self.fd, self.size)
+        except Exception:
+            os.close(self.fd)
+            raise
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def open_header(self, bits):
+        # Заголовок читается и, если нужно, пишется под блокировкой: файл
+        # может создаваться сразу несколькими процессами
+        size = os.fstat(self.fd).st_size
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        data = os.read(self.fd, HEADER.size) if size >= HEADER_SIZE else b""
+        if len(data) == HEADER.size:
+            magic, grid_size, key_bytes, entry_size, stored_bits, fingerprint = HEADER.unpack(data)
+            if magic == MAGIC:
+                if (grid_size, key_bytes, entry_size) != (self.grid_size, self.key_bytes, self.entry.size):
+                    raise ValueError(f"{self.path}: кэш позиций другого поля ({grid_size}x{grid_size})")
+                if size >= HEADER_SIZE + (self.bucket_bytes << stored_bits):
+                    if fingerprint != self.fingerprint:
+                        # Оценки старой эвристики не годятся; размер файла не меняем —
+                        # его могут держать открытым другие процессы
+                        self.clear(stored_bits)
+                    return stored_bits
+        os.ftruncate(self.fd, HEADER_SIZE + (self.bucket_bytes << bits))
+        self.write_header(bits)
+        return bits
+
+    def write_header(self, bits):
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        os.write(self.fd, HEADER.pack(MAGIC, self.grid_size, self.key_bytes, self.entry.size, bits,
+                                      self.fingerprint))
+
+    def clear(self, bits):
+        chunk = bytes(1 << 20)
+        os.lseek(self.fd, HEADER_SIZE, os.SEEK_SET)
+        left = self.bucket_bytes << bits
+        while left:
+            left -= os.write(self.fd, chunk[:min(left, len(chunk))])
+        self.write_header(bits)
+
+    @contextmanager
+    def locked(self, offset, length):
+        if fcntl is None:
+            yield
+            return
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, length, offset)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, length, offset)
+
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+            os.close(self.fd)
+            self.mmap = None
+
+    def bucket(self, key, root):
+        h = (fold(key) ^ (ROOT_SALT if root else 0)) * GOLDEN & MASK64
+        return HEADER_SIZE + (h >> (64 - self.bucket_bits)) * self.bucket_bytes
+
+    def lookup(self, key, root=False):
+        # (глубина, оценка, ход) или None
+        packed = key.to_bytes(self.key_bytes, "little")
+        offset = self.bucket(key, root)
+        mm, entry, size, key_bytes = self.mmap, self.entry, self.entry.size, self.key_bytes
+        for start in range(offset, offset + self.bucket_bytes, size):
+            if mm[start:start + key_bytes] != packed:
+                continue
+            raw = mm[start:start + size]
+            _, value, depth, move, _, checksum = entry.unpack(raw)
+            if checksum == zlib.crc32(raw[:-4]) and (move != NO_MOVE) == root:
+                self.hits += 1
+                return depth, value, move
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, move=NO_MOVE):
+        # Запись не заменяет более глубокий просчёт той же позиции
+        root = move != NO_MOVE
+        packed = key.to_bytes(self.key_bytes, "little")
+        now = stamp()
+        raw = self.entry.pack(packed, value, depth, move, now, 0)[:-4]
+        raw += zlib.crc32(raw).to_bytes(4, "little")
+        offset = self.bucket(key, root)
+        mm, entry, size = self.mmap, self.entry, self.entry.size
+        with self.locked(offset, self.bucket_bytes):
+            victim = None
+            worst = None
+            for start in range(offset, offset + self.bucket_bytes, size):
+                old = mm[start:start + size]
+                stored_key, _, stored_depth, stored_move, stored_stamp, checksum = entry.unpack(old)
+                if checksum != zlib.crc32(old[:-4]):
+                    # Пустой или испорченный слот
+                    victim = start
+                    break
+                if stored_key == packed and (stored_move != NO_MOVE) == root:
+                    if stored_depth > depth:
+                        return False
+                    victim = start
+                    break
+                rank = ((now - stored_stamp) & 0xFFFF, -stored_depth)
+                if worst is None or rank > worst:
+                    worst, victim = rank, start
+            mm[victim:victim + size] = raw
+        self.writes += 1
+        return True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def scan(self):
+        # Заполнение таблицы по всему файлу: (записей, корней, глубина -> число)
+        entries = roots = 0
+        depths = {}
+        crc32 = zlib.crc32
+        mm, size = self.mmap, self.entry.size
+        for start in range(HEADER_SIZE, self.size, size):
+            raw = mm[start:start + size]
+            if not any(raw) or crc32(raw[:-4]) != int.from_bytes(raw[-4:], "little"):
+                continue
+            _, _, depth, move, _, _ = self.entry.unpack(raw)
+            entries += 1
+            roots += move != NO_MOVE
+            depths[depth] = depths.get(depth, 0) + 1
+        return entries, roots, depths
+
+    def preload(self):
+        # Страницы файла — в память заранее, чтобы первая подсказка не ждала диск
+        if hasattr(mmap, "MADV_WILLNEED"):
+            self.mmap.madvise(mmap.MADV_WILLNEED)
+        page = mmap.PAGESIZE
+        return sum(self.mmap[i] for i in range(0, self.size, page))
+
+
+def open_position_cache(grid_size, path=None, max_bytes=POSITION_CACHE_BYTES):
+    # Кэш для решателя этого размера поля или None, если файл недоступен
+    from solver import HEURISTIC_FINGERPRINT
+    try:
+        return PositionCache(path or POSITION_CACHE_FILE.format(grid_size), grid_size, max_bytes,
+                             HEURISTIC_FINGERPRINT)
+    except (OSError, ValueError):
+        return None
+
+
+# --- прогрев ---
+
+def replay_positions(paths, grid_size):
+    # Позиции перед каждым ходом из записанных партий этого размера
+    from game_core import GameCore
+    from replay import iter_files, read_replays
+
+    for path in iter_files(paths):
+        for size, _, seed, counter, _, moves in read_replays(path):
+            if size != grid_size:
+                continue
+            core = GameCore(grid_size, seed=seed)
+            core.rng.counter = counter
+            core.reset()
+            for direction in moves:
+                yield core.board
+                core.step(direction)
+
+
+def warm_chunk(task):
+    # Один процесс-воркер: свой решатель, общий файл кэша
+    from solver import Expectimax
+    from game_core import GameCore
+    from rng import derive_seed
+
+    grid_size, path, max_bytes, depth, boards, games, seed = task
+    positions = open_position_cache(grid_size, path, max_bytes)
+    solver = Expectimax(grid_size, time_budget=float("inf"), max_depth=depth, positions=positions)
+    evaluated = 0
+    for board in boards:
+        solver.best_move(board)
+        evaluated += 1
+    for i in range(games):
+        core = GameCore(grid_size, seed=derive_seed(seed, i))
+        while not (core.win or core.game_over):
+            direction = solver.best_move(core.board)
+            evaluated += 1
+            if direction is None or not core.step(direction):
+                break
+    result = (evaluated, solver.nodes, positions.stats() if positions else {})
+    if positions is not None:
+        positions.close()
+    return result
+
+
+def warm(args):
+    path = args.path or POSITION_CACHE_FILE.format(args.size)
+    boards = list(dict.fromkeys(replay_positions(args.replays, args.size))) if args.replays else []
+    workers = args.workers or cpu_count()
+    tasks = []
+    for w in range(workers):
+        games = args.games // workers + (w < args.games % workers)
+        tasks.append((args.size, path, args.max_bytes, args.depth, boards[w::workers], games, args.seed + w))
+    started = time.perf_counter()
+    evaluated = nodes = hits = lookups = 0
+    with Pool(workers) as pool:
+        for count, chunk_nodes, stats in pool.imap_unordered(warm_chunk, tasks):
+            evaluated += count
+            nodes += chunk_nodes
+            hits += stats.get("hits", 0)
+            lookups += stats.get("hits", 0) + stats.get("misses", 0)
+    elapsed = time.perf_counter() - started
+    print(f"Позиций просчитано: {evaluated}, узлов: {nodes}, {elapsed:.1f} с, "
+          f"попаданий в кэш: {hits / lookups if lookups else 0:.0%}")
+    show_stats(args)
+
+
+def show_stats(args):
+    cache = open_position_cache(args.size, args.path, args.max_bytes)
+    if cache is None:
+        print("Кэш позиций недоступен")
+        return
+    entries, roots, depths = cache.scan()
+    capacity = (cache.size - HEADER_SIZE) // cache.entry.size
+    print(f"{cache.path}: {cache.size / 2 ** 20:.0f} МБ, записей {entries}/{capacity} "
+          f"({entries / capacity:.1%}), корней {roots}")
+    print("по глубине: " + ", ".join(f"{d}: {n}" for d, n in sorted(depths.items())))
+    cache.close()
+
+
+def preload(args):
+    cache = open_position_cache(args.size, args.path, args.max_bytes)
+    if cache is None:
+        print("Кэш позиций недоступен")
+        return
+    started = time.perf_counter()
+    cache.preload()
+    print(f"{cache.path}: {cache.size / 2 ** 20:.0f} МБ за {time.perf_counter() - started:.2f} с")
+    cache.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Кэш позиций решателя")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("warm", "stats", "preload"):
+        p = sub.add_parser(name)
+        p.add_argument("--size", type=int, default=4)
+        p.add_argument("--path", help="файл кэша (по умолчанию ~/.2048_positions_N.bin)")
+        p.add_argument("--max-bytes", type=int, default=POSITION_CACHE_BYTES)
+        if name == "warm":
+            p.add_argument("--replays", nargs="+", help="файлы или каталоги реплеев")
+            p.add_argument("--games", type=int, default=0, help="партий решателя с нуля")
+            p.add_argument("--depth", type=int, default=3)
+            p.add_argument("--workers", type=int)
+            p.add_argument("--seed", type=int, default=2048)
+    args = parser.parse_args(argv)
+    {"warm": warm, "stats": show_stats, "preload": preload}[args.command](args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+# Отрисовка поля в retained-режиме: плитки и подписи — спрайты в одном
+# SpriteList (текстуры подписей — из text_cache), счёт — arcade.Text в pyglet
+# Batch. Кадр рисуется двумя вызовами, а при ходе обновляются только
+# изменившиеся клетки: у подписи меняется текстура, вёрстки текста нет.
+# С анимацией (animated) под плитками лежит слой пустых клеток в том же
+# SpriteList: пустые плитки скрыты, а едущие плитки и подписи просто меняют
+# позицию и масштаб — число вызовов отрисовки от анимации не растёт.
+import colorsys
+
+import arcade
+from pyglet.graphics import Batch
+
+from text_cache import get_text_cache
+
+CELL_PADDING = 6
+BOX_HEIGHT = 50
+BOX_COLOR = (119, 110, 101)
+TILE_COLORS = {
+    0: (205, 193, 180), 2: (238, 228, 218), 4: (237, 224, 200),
+    8: (242, 177, 121), 16: (245, 149, 99), 32: (246, 124, 95),
+    64: (246, 94, 59), 128: (237, 207, 114), 256: (237, 204, 97),
+    512: (237, 200, 80), 1024: (237, 197, 63), 2048: (237, 194, 46)
+}
+TEXT_COLOR_LIGHT = arcade.color.WHITE
+TEXT_COLOR_DARK = arcade.color.BLACK
+# Подписи не рисуются на клетках меньше этого размера (поля 32x32 и 64x64)
+LABEL_MIN_CELL = 24
+# Длиннее — подпись вида 2^17
+LABEL_MAX_DIGITS = 4
+MAX_EXP = 63
+
+
+def tile_color(exp):
+    # После 2048 цвета не кончаются: оттенок идёт по кругу с шагом по показателю
+    value = 1 << exp if exp else 0
+    if value in TILE_COLORS:
+        return TILE_COLORS[value]
+    hue = (0.95 + (exp - 12) * 0.13) % 1.0
+    lightness = 0.75 - 0.25 * ((exp - 12) // 8 % 2)
+    return tuple(int(x * 255) for x in colorsys.hsv_to_rgb(hue, 0.55, lightness))
+
+
+def tile_label(exp):
+    if not exp:
+        return ""
+    text = str(1 << exp)
+    return text if len(text) <= LABEL_MAX_DIGITS else f"2^{exp}"
+
+
+# Цвет и подпись по показателю log2 — без вычислений на каждый ход
+TILE_PALETTE = [tile_color(exp) for exp in range(MAX_EXP + 1)]
+TILE_LABELS = [tile_label(exp) for exp in range(MAX_EXP + 1)]
+
+
+class BoardRenderer:
+    def __init__(self, grid_size, cell_size, offset_x, offset_y, field_pixel_size, animated=False):
+        self.grid_size = grid_size
+        self.cell_size = cell_size
+        self.animated = animated
+        self.sprites = arcade.SpriteList()
+        self.batch = Batch()
+        if grid_size <= 7:
+            self.font_size = max(24, int(cell_size * 0.45))
+        else:
+            self.font_size = max(6, int(cell_size * 0.28))
+        with_labels = cell_size >= LABEL_MIN_CELL
+
+        tile_size = cell_size - min(CELL_PADDING, max(1, int(cell_size * 0.08)))
+        self.tiles = []
+        self.labels = []
+        self.centers = [(offset_x + c * cell_size + cell_size / 2, offset_y + r * cell_size + cell_size / 2)
+                        for r in range(grid_size) for c in range(grid_size)]
+        if animated:
+            for x, y in self.centers:
+                self.sprites.append(arcade.SpriteSolidColor(tile_size, tile_size, x, y, TILE_COLORS[0]))
+        for x, y in self.centers:
+            tile = arcade.SpriteSolidColor(tile_size, tile_size, x, y, TILE_COLORS[0])
+            tile.visible = not animated
+            self.sprites.append(tile)
+            self.tiles.append(tile)
+        # Подписи идут в списке после всех плиток и рисуются поверх них
+        self.text_cache = get_text_cache()
+        for x, y in self.centers if with_labels else ():
+            label = arcade.Sprite(self.label_texture(1), center_x=x, center_y=y)
+            label.visible = False
+            self.sprites.append(label)
+            self.labels.append(label)
+        self.values = [0] * (grid_size * grid_size)
+        # Показатели, которые сейчас на экране, для больших полей (массив numpy)
+        self.shown = None
+
+        # Боксы Score и Best под полем (слева)
+        box_w = field_pixel_size * 0.45
+        left_x = offset_x + box_w / 2
+        box_y = offset_y - BOX_HEIGHT / 2 - 10
+        self.score_value = self.best_value = None
+        for x in (left_x, left_x + box_w + 10):
+            self.sprites.append(arcade.SpriteSolidColor(box_w, BOX_HEIGHT, x, box_y, BOX_COLOR))
+        self.score_text = arcade.Text("", left_x, box_y, TEXT_COLOR_LIGHT, 20,
+                                      anchor_x="center", anchor_y="center", batch=self.batch)
+        self.best_text = arcade.Text("", left_x + box_w + 10, box_y, TEXT_COLOR_LIGHT, 20,
+                                     anchor_x="center", anchor_y="center", batch=self.batch)
+
+    def set_cell(self, index, value):
+        self.set_exp(index, value.bit_length() - 1 if value else 0)
+
+    def set_exp(self, index, exp):
+        self.values[index] = 1 << exp if exp else 0
+        tile = self.tiles[index]
+        tile.color = TILE_PALETTE[exp]
+        if self.animated:
+            tile.visible = exp != 0
+        if self.labels:
+            label = self.labels[index]
+            if exp:
+                label.texture = self.label_texture(exp)
+            label.visible = exp != 0
+
+    def label_texture(self, exp):
+        color = TEXT_COLOR_DARK if exp <= 2 else TEXT_COLOR_LIGHT
+        return self.text_cache.texture(TILE_LABELS[exp], self.font_size, color)
+
+    def update_grid(self, grid):
+        # Сравниваем строки целиком и трогаем только изменившиеся клетки
+        n = self.grid_size
+        values = self.values
+        for r, row in enumerate(grid):
+            start = r * n
+            if values[start:start + n] == row:
+                continue
+            for c, value in enumerate(row):
+                if values[start + c] != value:
+                    self.set_cell(start + c, value)
+
+    def update_values(self, values):
+        # То же для плоского списка номиналов по клеткам r * n + c
+        shown = self.values
+        for index, value in enumerate(values):
+            if shown[index] != value:
+                self.set_cell(index, value)
+
+    def update_cells(self, cells):
+        # Поле ArrayCore (массив показателей): изменившиеся клетки находит
+        # одно векторное сравнение, спрайты трогаются только для них
+        flat = cells.ravel()
+        if self.shown is None:
+            self.shown = flat.copy()
+            changed = range(len(flat))
+        else:
+            changed = (flat != self.shown).nonzero()[0].tolist()
+            self.shown[changed] = flat[changed]
+        for index in changed:
+            self.set_exp(index, int(flat[index]))
+
+    def slide(self, animation):
+        # Кадр сдвига: на экране поле до хода, плитки едут по путям анимации
+        t = animation.slide_progress()
+        centers, tiles, labels = self.centers, self.tiles, self.labels
+        for source, target in animation.paths:
+            x0, y0 = centers[source]
+            x1, y1 = centers[target]
+            position = (x0 + (x1 - x0) * t, y0 + (y1 - y0) * t)
+            tiles[source].position = position
+            if labels:
+                labels[source].position = position
+
+    def pop(self, animation):
+        # Кадр вспышки: поле уже после хода, плитки на своих местах
+        self.home(animation)
+        for cell, start in animation.pops:
+            scale = animation.pop_scale(start)
+            self.tiles[cell].scale = scale
+            if self.labels:
+                self.labels[cell].scale = scale
+
+    def home(self, animation):
+        centers, tiles, labels = self.centers, self.tiles, self.labels
+        for source, _ in animation.paths:
+            tiles[source].position = centers[source]
+            if labels:
+                labels[source].position = centers[source]
+
+    def settle(self, animation):
+        # Конец анимации или перемотка: позиции и масштаб как в покое
+        self.home(animation)
+        for cell, _ in animation.pops:
+            self.tiles[cell].scale = 1.0
+            if self.labels:
+                self.labels[cell].scale = 1.0
+
+    def update_scores(self, score, best_score):
+        if score != self.score_value:
+            self.score_value = score
+            self.score_text.text = f"Score: {score}"
+        if best_score != self.best_value:
+            self.best_value = best_score
+            self.best_text.text = f"Best: {best_score}"
+
+    def draw(self):
+        self.sprites.draw()
+        self.batch.draw()
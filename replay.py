@@ -0,0 +1,330 @@
+# Запись и проверка партий.
+# Партия полностью определяется seed/счётчиком ГСЧ в начале и списком ходов,
+# поэтому в файл пишется заголовок и ходы по 2 бита (4 хода в байте).
+# Файл может содержать несколько записей подряд.
+# Проверка идёт на пуле процессов: основной процесс читает только заголовки
+# и раздаёт куски файлов по VERIFY_BATCH партий, воркер сам читает ходы.
+#
+#   python replay.py verify ~/.2048_replays     — пересчитать счёт всех партий
+#   python replay.py verify DIR --workers 8
+#   python replay.py show FILE --moves 100      — поле после 100 ходов
+import argparse
+import atexit
+import os
+import struct
+import time
+from multiprocessing import Pool, cpu_count
+
+REPLAY_DIR = os.path.join(os.path.expanduser("~"), ".2048_replays")
+MAGIC = b"2RPL"
+VERSION = 1
+# magic, версия, размер поля, флаги, seed, счётчик ГСЧ, счёт, число ходов
+HEADER = struct.Struct("<4sBBBxQQQI")
+FLAG_FINISHED = 1
+# Партий в одном задании проверки; внутри задания — пачки одного размера поля
+VERIFY_BATCH = 4096
+
+
+class ReplayRecorder:
+    def __init__(self, directory=REPLAY_DIR):
+        self.directory = directory
+        self.file = None
+        self.path = None
+        self.moves = 0
+        atexit.register(self.close)
+
+    def begin(self, grid_size, seed, counter):
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{grid_size}x{grid_size}-{seed:016x}-{counter}.rpl"
+        self.path = os.path.join(self.directory, name)
+        self.file = open(self.path, "w+b")
+        self.grid_size, self.seed, self.counter = grid_size, seed, counter
+        self.moves = 0
+        self.pending = 0
+        self.score = 0
+        self.write_header(0)
+
+    def resume(self, path, expected_moves):
+        # Продолжить запись после перезапуска (автосохранённая партия).
+        # Файл может быть длиннее сохранённой партии (после sync были ещё ходы)
+        # или с устаревшим заголовком (падение без close): верим заголовку или
+        # целым байтам ходов, лишнее отрезаем. Если ходов в файле не хватает,
+        # запись не ведётся, но путь остаётся ключом партии и ходы считаются
+        self.close()
+        self.path = path
+        self.moves = expected_moves
+        try:
+            self.file = open(path, "r+b")
+        except OSError:
+            return False
+        header = self.file.read(HEADER.size)
+        data = self.file.seek(0, os.SEEK_END) - HEADER.size
+        if len(header) == HEADER.size:
+            magic, _, self.grid_size, _, self.seed, self.counter, self.score, moves = HEADER.unpack(header)
+            # Байт с недописанными ходами (sync или close) лежит сразу за целыми
+            known = moves if moves & 3 and data == moves // 4 + 1 else max(moves, 4 * data)
+        if len(header) != HEADER.size or magic != MAGIC or expected_moves > known \
+                or data < (expected_moves + 3) // 4:
+            self.file.close()
+            self.file = None
+            return False
+        self.pending = 0
+        offset = HEADER.size + self.moves // 4
+        self.file.seek(offset)
+        if self.moves % 4:
+            # Ходы после expected_moves в этом байте обнуляются
+            self.pending = self.file.read(1)[0] & ((1 << (2 * (self.moves % 4))) - 1)
+        self.file.seek(offset)
+        self.file.truncate()
+        return True
+
+    def write_header(self, flags):
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.grid_size, flags,
+                                    self.seed, self.counter, self.score, self.moves))
+        self.file.seek(0, os.SEEK_END)
+
+    def record(self, direction):
+        if self.file is None:
+            if self.path is not None:
+                # Файл потерян: ходы только считаются для таблицы лидеров
+                self.moves += 1
+            return
+        self.pending |= direction << (2 * (self.moves & 3))
+        self.moves += 1
+        if not self.moves & 3:
+            self.file.write(bytes((self.pending,)))
+            self.pending = 0
+
+    def sync(self):
+        # Автосохранение: заголовок с текущим числом ходов и недописанный байт
+        # уходят в файл, буфер сбрасывается. После падения процесса resume
+        # найдёт в файле все ходы сохранённой партии. Позиция остаётся перед
+        # недописанным байтом — следующий целый байт ляжет на его место
+        if self.file is None:
+            return
+        offset = self.file.tell()
+        if self.moves & 3:
+            self.file.write(bytes((self.pending,)))
+        self.write_header(0)
+        self.file.seek(offset)
+        self.file.flush()
+
+    def rewind(self):
+        # Убрать последний записанный ход (отмена хода). Законченная партия
+        # открывается заново, флаг завершения снимется при следующем закрытии
+        if self.file is None:
+            if not (self.path and self.moves):
+                return False
+            if not self.resume(self.path, self.moves):
+                self.moves -= 1
+                return True
+        if not self.moves:
+            return False
+        if not self.moves & 3:
+            # Байт с последним ходом уже на диске — забираем его обратно;
+            # после sync за ним может лежать устаревший недописанный байт
+            offset = self.file.tell() - 1
+            self.file.seek(offset)
+            self.pending = self.file.read(1)[0]
+            self.file.seek(offset)
+            self.file.truncate()
+        self.moves -= 1
+        self.pending &= ~(3 << (2 * (self.moves & 3)))
+        return True
+
+    def finish(self, score):
+        self.score = score
+        self.close(FLAG_FINISHED)
+
+    def close(self, flags=0):
+        # Незаконченная партия сохраняется без флага завершения и без счёта
+        if self.file is None:
+            return
+        if not self.moves and not flags:
+            # Партия без ходов: хранить нечего
+            self.file.close()
+            self.file = None
+            os.remove(self.path)
+            return
+        if self.moves & 3:
+            self.file.write(bytes((self.pending,)))
+        self.write_header(flags)
+        self.file.close()
+        self.file = None
+
+
+def read_replays(path, offset=0, limit=None):
+    # Генератор записей: (grid_size, flags, seed, counter, score, moves[]);
+    # offset и limit — с какого байта и сколько записей читать
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    offset = 0
+    while offset + HEADER.size <= len(data) and limit != 0:
+        magic, _, grid_size, flags, seed, counter, score, count = HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            break
+        offset += HEADER.size
+        packed = data[offset:offset + (count + 3) // 4]
+        offset += (count + 3) // 4
+        moves = [(packed[i >> 2] >> (2 * (i & 3))) & 3 for i in range(count)]
+        if limit is not None:
+            limit -= 1
+        yield grid_size, flags, seed, counter, score, moves
+
+
+def scan_replays(path):
+    # Смещения записей файла — по одним заголовкам, ходы не читаются
+    offsets = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + HEADER.size <= size:
+            f.seek(offset)
+            header = HEADER.unpack(f.read(HEADER.size))
+            if header[0] != MAGIC:
+                break
+            offsets.append(offset)
+            offset += HEADER.size + (header[-1] + 3) // 4
+    return offsets
+
+
+def iter_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".rpl"):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def verify_group(grid_size, records):
+    # Все партии пачки идут одновременно в BatchSimulator, ход t — один вызов step
+    import numpy as np
+    from batch import BatchSimulator
+
+    count = len(records)
+    sim = BatchSimulator(count, grid_size, seeds=[r[2] for r in records], counters=[r[3] for r in records])
+    lengths = np.array([len(r[5]) for r in records])
+    longest = int(lengths.max()) if count else 0
+    moves = np.full((count, longest), 4, np.int64)
+    for i, record in enumerate(records):
+        moves[i, :len(record[5])] = record[5]
+
+    valid = np.ones(count, bool)
+    for t in range(longest):
+        playing = lengths > t
+        # Ход после конца партии или ход, не изменивший поле, — подделка
+        valid &= ~(playing & sim.done)
+        changed, _, _ = sim.step(moves[:, t])
+        valid &= changed | ~playing
+    claims = np.array([r[4] for r in records], np.int64)
+    finished = np.array([bool(r[1] & FLAG_FINISHED) for r in records])
+    # Счёт заявляют только законченные партии
+    valid &= (sim.scores == claims) | ~finished
+    valid &= sim.done | ~finished
+    return valid
+
+
+def verify_tasks(paths, batch=VERIFY_BATCH):
+    # Задание — список кусков (файл, смещение, номер первой записи, записей)
+    # на batch партий; в реплеях игры одна партия на файл, так что задание
+    # обычно собирается из многих файлов
+    task, records = [], 0
+    for path in iter_files(paths):
+        offsets = scan_replays(path)
+        first = 0
+        while first < len(offsets):
+            count = min(len(offsets) - first, batch - records)
+            task.append((path, offsets[first], first, count))
+            records += count
+            first += count
+            if records == batch:
+                yield task
+                task, records = [], 0
+    if task:
+        yield task
+
+
+def verify_task(task):
+    # Воркер: читает свои куски, делит партии по размерам поля и проверяет.
+    # Возвращает (проверено партий, имена несовпавших)
+    groups = {}
+    for path, offset, first, count in task:
+        for index, record in enumerate(read_replays(path, offset, count), first):
+            groups.setdefault(record[0], []).append((record, f"{path}#{index}"))
+    total = 0
+    bad = []
+    for grid_size, group in sorted(groups.items()):
+        records, names = zip(*group)
+        valid = verify_group(grid_size, records)
+        total += len(records)
+        bad += [name for ok, name in zip(valid, names) if not ok]
+    return total, bad
+
+
+def verify(paths, workers=None):
+    workers = cpu_count() if workers is None else workers
+    total = bad = 0
+    started = time.perf_counter()
+
+    def report(results):
+        nonlocal total, bad
+        for count, names in results:
+            total += count
+            bad += len(names)
+            for name in names:
+                print(f"НЕ СОВПАДАЕТ: {name}")
+
+    if workers > 1:
+        with Pool(workers) as pool:
+            report(pool.imap(verify_task, verify_tasks(paths)))
+    else:
+        report(map(verify_task, verify_tasks(paths)))
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed * 60 if elapsed else 0
+    print(f"Проверено партий: {total}, не совпало: {bad}, {elapsed:.1f} с ({rate:.0f} партий/мин)")
+    return bad == 0
+
+
+def show(path, index, limit):
+    from game_core import GameCore
+
+    for i, (grid_size, flags, seed, counter, score, moves) in enumerate(read_replays(path)):
+        if i != index:
+            continue
+        core = GameCore(grid_size, seed=seed)
+        core.rng.counter = counter
+        core.reset()
+        for direction in moves[:limit]:
+            core.step(direction)
+        for row in reversed(core.grid):
+            print(" ".join(f"{v:>5}" for v in row))
+        print(f"Ходов: {min(limit, len(moves))}/{len(moves)}  счёт: {core.score} (заявлено {score})")
+        return
+    print("Нет такой записи")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Реплеи 2048")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("verify", help="пересчитать партии и сверить счёт")
+    p.add_argument("paths", nargs="*", default=[REPLAY_DIR])
+    p.add_argument("--workers", type=int, default=cpu_count(), help="процессов проверки (1 — без пула)")
+    p = sub.add_parser("show", help="показать поле после N ходов")
+    p.add_argument("path")
+    p.add_argument("--index", type=int, default=0, help="номер записи в файле")
+    p.add_argument("--moves", type=int, default=10 ** 9)
+    args = parser.parse_args(argv)
+    if args.command == "verify":
+        return 0 if verify(args.paths, args.workers) else 1
+    show(args.path, args.index, args.moves)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,37 @@
+# Генератор случайных чисел для появления плиток.
+# SplitMix64 со счётчиком: состояние — это (seed, counter), поэтому его легко
+# сохранить, восстановить и повторить векторно в numpy (batch.py).
+import random
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+SEED_GAMMA = 0xD1B54A32D192ED03
+MIX_1 = 0xBF58476D1CE4E5B9
+MIX_2 = 0x94D049BB133111EB
+DOUBLE_UNIT = 1.0 / (1 << 53)
+
+
+def mix64(z):
+    z = ((z ^ (z >> 30)) * MIX_1) & MASK64
+    z = ((z ^ (z >> 27)) * MIX_2) & MASK64
+    return z ^ (z >> 31)
+
+
+def derive_seed(seed, index):
+    # Независимый seed для index-й доски/воркера из общего seed
+    return mix64((seed + (index + 1) * SEED_GAMMA) & MASK64)
+
+
+class SplitMix64:
+    def __init__(self, seed=None, counter=0):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed & MASK64
+        self.counter = counter
+
+    def next64(self):
+        self.counter += 1
+        return mix64((self.seed + self.counter * GOLDEN_GAMMA) & MASK64)
+
+    def random(self):
+        return (self.next64() >> 11) * DOUBLE_UNIT
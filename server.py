@@ -0,0 +1,227 @@
+# Игровой сервер: много партий в одном процессе, без окон.
+# asyncio поверх TCP или Unix-сокета, сообщения — короткие двоичные кадры.
+# Партия хранится компактно (упакованное поле, счёт, состояние ГСЧ), правила
+# — те же, что в игре: ход делает GameCore, один на размер поля, в который
+# состояние партии загружается на время хода.
+# Запросы, пришедшие за один проход цикла событий, обрабатываются пачкой,
+# ответы каждому соединению уходят одной записью.
+#
+#   python server.py --port 2048               — TCP на 127.0.0.1
+#   python server.py --unix /tmp/2048.sock     — Unix-сокет
+#
+# Запрос: op, arg, session (REQUEST). Ответ: op, флаги, размер поля, session,
+# счёт (RESPONSE) и упакованное поле, engine.board_bytes байт для этого размера.
+# Ходить, смотреть и закрывать партию может только открывшее её соединение,
+# на чужую или неизвестную партию ответ — FLAG_ERROR без поля.
+import argparse
+import asyncio
+import random
+import struct
+import time
+
+from engine import cell_bits
+from game_core import GameCore
+from rng import derive_seed
+
+REQUEST = struct.Struct("<BBI")
+RESPONSE = struct.Struct("<BBBII")
+
+OP_NEW = 1      # arg — размер поля, session не используется
+OP_MOVE = 2     # arg — направление
+OP_STATE = 3
+OP_CLOSE = 4
+
+FLAG_MOVED = 1
+FLAG_WIN = 2
+FLAG_GAME_OVER = 4
+FLAG_ERROR = 128
+
+GRID_SIZES = (4, 5, 7)
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 2048
+# Секунд между строками статистики сервера
+REPORT_EVERY = 5.0
+
+
+def board_size(grid_size):
+    # Длина упакованного поля в ответе, как engine.board_bytes
+    return (grid_size * grid_size * cell_bits(grid_size) + 7) // 8
+
+
+class Session:
+    # Около 250 байт на партию вместе с записью в словаре: 100 тысяч партий — ~25 МБ
+    __slots__ = ("grid_size", "board", "score", "seed", "counter", "max_exp", "flags")
+
+    def __init__(self, grid_size, seed):
+        self.grid_size = grid_size
+        self.seed = seed
+
+
+class GameServer:
+    def __init__(self, seed=None):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.sessions = {}
+        self.next_id = 1
+        # Один GameCore на размер поля: состояние партии загружается в него на время хода
+        self.cores = {size: GameCore(size, seed=0) for size in GRID_SIZES}
+        self.pending = []
+        self.scheduled = False
+        self.loop = None
+        self.moves = 0
+        self.ticks = 0
+
+    # --- партии ---
+
+    def load(self, session):
+        core = self.cores[session.grid_size]
+        core.rng.seed = session.seed
+        core.set_state(session.board, session.score, bool(session.flags & FLAG_WIN),
+                       bool(session.flags & FLAG_GAME_OVER), session.counter, session.max_exp)
+        return core
+
+    def save(self, session, core, moved):
+        session.board = core.board
+        session.score = core.score
+        session.counter = core.rng.counter
+        session.max_exp = core.max_exp
+        session.flags = ((FLAG_MOVED if moved else 0) | (FLAG_WIN if core.win else 0)
+                         | (FLAG_GAME_OVER if core.game_over else 0))
+
+    def new_session(self, grid_size):
+        session_id = self.next_id
+        self.next_id += 1
+        session = Session(grid_size, derive_seed(self.seed, session_id))
+        core = self.cores[grid_size]
+        core.rng.seed = session.seed
+        core.rng.counter = 0
+        core.reset()
+        self.save(session, core, False)
+        self.sessions[session_id] = session
+        return session_id, session
+
+    # --- обработка запросов ---
+
+    def submit(self, connection, op, arg, session_id):
+        self.pending.append((connection, op, arg, session_id))
+        if not self.scheduled:
+            # Всё, что придёт до конца текущего прохода цикла, уйдёт одной пачкой
+            self.scheduled = True
+            self.loop.call_soon(self.process)
+
+    def process(self):
+        self.scheduled = False
+        pending, self.pending = self.pending, []
+        self.ticks += 1
+        touched = set()
+        for connection, op, arg, session_id in pending:
+            connection.out += self.handle(connection, op, arg, session_id)
+            touched.add(connection)
+        for connection in touched:
+            connection.flush()
+
+    def handle(self, connection, op, arg, session_id):
+        if op == OP_NEW:
+            if arg not in self.cores:
+                return RESPONSE.pack(op, FLAG_ERROR, 0, 0, 0)
+            session_id, session = self.new_session(arg)
+            connection.sessions.add(session_id)
+            return self.reply(op, session_id, session)
+
+        # Партией распоряжается только открывшее её соединение
+        if session_id not in connection.sessions:
+            return RESPONSE.pack(op, FLAG_ERROR, 0, session_id, 0)
+        session = self.sessions[session_id]
+        if op == OP_MOVE:
+            if arg > 3:
+                return RESPONSE.pack(op, FLAG_ERROR, 0, session_id, 0)
+            core = self.load(session)
+            moved = core.step(arg)
+            self.save(session, core, moved)
+            self.moves += moved
+        elif op == OP_CLOSE:
+            del self.sessions[session_id]
+            connection.sessions.discard(session_id)
+        elif op != OP_STATE:
+            return RESPONSE.pack(op, FLAG_ERROR, 0, session_id, 0)
+        return self.reply(op, session_id, session)
+
+    @staticmethod
+    def reply(op, session_id, session):
+        return (RESPONSE.pack(op, session.flags, session.grid_size, session_id, session.score)
+                + session.board.to_bytes(board_size(session.grid_size), "little"))
+
+    def drop(self, connection):
+        # Соединение закрылось — его партии больше никто не продолжит
+        for session_id in connection.sessions:
+            self.sessions.pop(session_id, None)
+        connection.sessions.clear()
+
+    async def report(self, every):
+        last_moves, last_time = 0, time.perf_counter()
+        while True:
+            await asyncio.sleep(every)
+            now = time.perf_counter()
+            rate = (self.moves - last_moves) / (now - last_time)
+            print(f"партий: {len(self.sessions)}, ходов/с: {rate:.0f}, проходов цикла: {self.ticks}")
+            last_moves, last_time = self.moves, now
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix=None, report_every=REPORT_EVERY):
+        self.loop = asyncio.get_running_loop()
+        if unix:
+            server = await self.loop.create_unix_server(lambda: Connection(self), unix)
+        else:
+            server = await self.loop.create_server(lambda: Connection(self), host, port)
+        if report_every:
+            self.loop.create_task(self.report(report_every))
+        async with server:
+            await server.serve_forever()
+
+
+class Connection(asyncio.Protocol):
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.buffer = bytearray()
+        self.out = bytearray()
+        self.sessions = set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        buffer = self.buffer
+        buffer += data
+        size = REQUEST.size
+        end = len(buffer) - len(buffer) % size
+        submit = self.server.submit
+        for op, arg, session_id in REQUEST.iter_unpack(bytes(buffer[:end])):
+            submit(self, op, arg, session_id)
+        del buffer[:end]
+
+    def flush(self):
+        if self.out and not self.transport.is_closing():
+            self.transport.write(bytes(self.out))
+        self.out.clear()
+
+    def connection_lost(self, exc):
+        self.server.drop(self)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер партий 2048")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--report-every", type=float, default=REPORT_EVERY)
+    args = parser.parse_args(argv)
+    server = GameServer(args.seed)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix, args.report_every))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+# Expectimax для подсказок и автоигры.
+# Ходы игрока — узлы максимума, появление плитки — узел ожидания
+# (2 с вероятностью 90%, 4 — 10%, как в GameCore.spawn_one_tile).
+# Позиции кэшируются в ограниченной LRU-таблице по каноническому полю
+# (минимум из 8 симметрий), глубина растёт, пока хватает времени на ход.
+# Вторым уровнем может стоять position_cache.PositionCache — общий для
+# процессов файл, который переживает партию и перезапуск.
+import time
+import zlib
+from collections import OrderedDict
+
+from engine import get_engine, symmetry_direction, LEFT, RIGHT, UP, DOWN
+
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+SPAWN_ODDS = ((1, 0.9), (2, 0.1))
+
+# Веса эвристики строки (по мотивам известных решателей 2048)
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+# Ветки с вероятностью ниже порога оцениваются эвристикой сразу
+MIN_PROBABILITY = 0.0001
+CHECK_TIME_EVERY = 256
+# Узлы мельче этой глубины в общий кэш позиций не пишутся: их дешевле пересчитать
+PERSIST_MIN_DEPTH = 2
+# Отпечаток эвристики: по нему кэш позиций понимает, что оценки устарели
+HEURISTIC_FINGERPRINT = zlib.crc32(repr((
+    SPAWN_ODDS, LOST_PENALTY, MONOTONICITY_POWER, MONOTONICITY_WEIGHT, SUM_POWER, SUM_WEIGHT,
+    MERGES_WEIGHT, EMPTY_WEIGHT, MIN_PROBABILITY)).encode())
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+def row_heuristic(cells):
+    total = 0.0
+    empty = 0
+    merges = 0
+    prev = 0
+    counter = 0
+    for exp in cells:
+        total += exp ** SUM_POWER
+        if exp == 0:
+            empty += 1
+        else:
+            if prev == exp:
+                counter += 1
+            elif counter > 0:
+                merges += 1 + counter
+                counter = 0
+            prev = exp
+    if counter > 0:
+        merges += 1 + counter
+
+    mono_left = mono_right = 0.0
+    for a, b in zip(cells, cells[1:]):
+        if a > b:
+            mono_left += a ** MONOTONICITY_POWER - b ** MONOTONICITY_POWER
+        else:
+            mono_right += b ** MONOTONICITY_POWER - a ** MONOTONICITY_POWER
+
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges
+            - MONOTONICITY_WEIGHT * min(mono_left, mono_right) - SUM_WEIGHT * total)
+
+
+class HeuristicTable(dict):
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def __missing__(self, key):
+        value = self[key] = row_heuristic(self.engine.unpack_row(key))
+        return value
+
+
+class Expectimax:
+    def __init__(self, grid_size=4, cache_size=200000, time_budget=0.05, max_depth=8, positions=None,
+                 reuse_depth=None):
+        self.engine = get_engine(grid_size)
+        self.heuristic = HeuristicTable(self.engine)
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.positions = positions
+        # Сохранённый корень хотя бы такой глубины отдаётся без поиска
+        self.reuse_depth = max_depth if reuse_depth is None else reuse_depth
+
+        self.nodes = 0
+        self.cache_lookups = 0
+        self.cache_hits = 0
+        self.search_time = 0.0
+        self.last_depth = 0
+
+    # --- статистика ---
+
+    def nodes_per_sec(self):
+        return self.nodes / self.search_time if self.search_time else 0.0
+
+    def cache_hit_rate(self):
+        return self.cache_hits / self.cache_lookups if self.cache_lookups else 0.0
+
+    def stats(self):
+        return {
+            "nodes": self.nodes,
+            "nodes_per_sec": self.nodes_per_sec(),
+            "cache_hit_rate": self.cache_hit_rate(),
+            "cache_entries": len(self.cache),
+            "depth": self.last_depth,
+            "positions": self.positions.stats() if self.positions is not None else None,
+        }
+
+    # --- поиск ---
+
+    def evaluate(self, board):
+        engine = self.engine
+        heuristic = self.heuristic
+        mask = engine.row_mask
+        transposed = engine.transpose(board)
+        total = 0.0
+        for s in engine.row_shifts:
+            total += heuristic[(board >> s) & mask] + heuristic[(transposed >> s) & mask]
+        return total
+
+    def best_move(self, board, time_budget=None):
+        # Итеративное углубление: возвращаем ход последней полностью
+        # просчитанной глубины
+        budget = self.time_budget if time_budget is None else time_budget
+        start = time.perf_counter()
+        self.deadline = start + budget
+        best = None
+        candidates = []
+        for direction in DIRECTIONS:
+            moved, _ = self.engine.move(board, direction)
+            if moved != board:
+                candidates.append((direction, moved))
+        if not candidates:
+            return None
+
+        # Корень, уже просчитанный этим или другим процессом: ход готов сразу,
+        # а углубление продолжается с сохранённой глубины
+        positions = self.positions
+        first_depth = 1
+        stored_depth = 0
+        if positions is not None:
+            key, symmetry = self.engine.canonical_index(board)
+            stored = positions.lookup(key, root=True)
+            if stored is not None:
+                stored_depth, _, move = stored
+                best = symmetry_direction(move, symmetry, inverse=True)
+                self.last_depth = first_depth = min(stored_depth, self.max_depth)
+                if stored_depth >= self.reuse_depth:
+                    self.search_time += time.perf_counter() - start
+                    return best
+                first_depth += 1
+
+        completed = None
+        try:
+            for depth in range(first_depth, self.max_depth + 1):
+                scored = [(self.chance_node(moved, depth, 1.0), direction) for direction, moved in candidates]
+                completed = max(scored)
+                best = completed[1]
+                self.last_depth = depth
+                if time.perf_counter() > self.deadline:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            self.search_time += time.perf_counter() - start
+        if positions is not None and completed is not None and self.last_depth > stored_depth:
+            positions.store(key, self.last_depth, completed[0], symmetry_direction(best, symmetry))
+        return best if best is not None else candidates[0][0]
+
+    def max_node(self, board, depth, probability):
+        best = 0.0
+        for direction in DIRECTIONS:
+            moved, _ = self.engine.move(board, direction)
+            if moved != board:
+                value = self.chance_node(moved, depth, probability)
+                if value > best:
+                    best = value
+        return best
+
+    def chance_node(self, board, depth, probability):
+        self.nodes += 1
+        if self.nodes % CHECK_TIME_EVERY == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        depth -= 1
+        if depth <= 0 or probability < MIN_PROBABILITY:
+            return self.evaluate(board)
+
+        key = self.engine.canonical(board)
+        self.cache_lookups += 1
+        entry = self.cache.get(key)
+        if entry is not None and entry[0] >= depth:
+            self.cache_hits += 1
+            self.cache.move_to_end(key)
+            return entry[1]
+        positions = self.positions
+        if positions is not None and depth >= PERSIST_MIN_DEPTH:
+            stored = positions.lookup(key)
+            if stored is not None and stored[0] >= depth:
+                self.cache_hits += 1
+                self.remember(key, stored[0], stored[1])
+                return stored[1]
+
+        empty = self.engine.empty_shifts(board)
+        if not empty:
+            return self.evaluate(board)
+        total = 0.0
+        cell_probability = probability / len(empty)
+        for shift in empty:
+            for exp, odds in SPAWN_ODDS:
+                total += odds * self.max_node(board | (exp << shift), depth, cell_probability * odds)
+        value = total / len(empty)
+
+        self.remember(key, depth, value)
+        if positions is not None and depth >= PERSIST_MIN_DEPTH:
+            positions.store(key, depth, value)
+        return value
+
+    def remember(self, key, depth, value):
+        self.cache[key] = (depth, value)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
@@ -0,0 +1,87 @@
+# Потоковые оценки для больших прогонов: память не зависит от числа партий.
+import math
+
+# Относительная точность процентилей — шаг логарифмических корзин
+HISTOGRAM_RATIO = 1.01
+
+
+class StreamingHistogram:
+    # Гистограмма с логарифмическими корзинами: процентили с ошибкой ~1%
+    def __init__(self, ratio=HISTOGRAM_RATIO):
+        self.log_ratio = math.log(ratio)
+        self.ratio = ratio
+        self.bins = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, weight=1):
+        key = int(math.log1p(value) / self.log_ratio) if value > 0 else -1
+        self.bins[key] = self.bins.get(key, 0) + weight
+        self.count += weight
+        self.total += value * weight
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for key, weight in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + weight
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q / 100 * (self.count - 1)
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                if key < 0:
+                    return 0.0
+                # Середина корзины, ограниченная наблюдавшимися min/max
+                value = math.expm1((key + 0.5) * self.log_ratio)
+                return min(max(value, self.min), self.max)
+        return float(self.max)
+
+
+class GameStats:
+    # Сводка по партиям одной группы (размер поля, стратегия)
+    def __init__(self):
+        self.games = 0
+        self.wins = 0
+        self.moves = 0
+        self.wall_time = 0.0
+        self.scores = StreamingHistogram()
+        self.max_tiles = {}
+
+    def add(self, score, max_tile, moves, wall_time, won=False):
+        self.games += 1
+        self.wins += bool(won)
+        self.moves += moves
+        self.wall_time += wall_time
+        self.scores.add(score)
+        self.max_tiles[max_tile] = self.max_tiles.get(max_tile, 0) + 1
+
+    def summary(self):
+        return {
+            "games": self.games,
+            "wins": self.wins,
+            "mean_score": self.scores.mean(),
+            "p50": self.scores.percentile(50),
+            "p90": self.scores.percentile(90),
+            "p99": self.scores.percentile(99),
+            "max_score": self.scores.max or 0,
+            "mean_moves": self.moves / self.games if self.games else 0.0,
+            "games_per_sec": self.games / self.wall_time if self.wall_time else 0.0,
+            "max_tiles": {str(tile): n for tile, n in sorted(self.max_tiles.items())},
+        }
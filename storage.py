@@ -0,0 +1,136 @@
+# Хранилище рекордов и автосохранения партии.
+# Всё состояние живёт в памяти, на диск его пишет фоновый поток: частые
+# изменения склеиваются в одну запись, файл заменяется атомарно через
+# временный файл и os.replace, так что при падении остаётся старая или новая
+# версия целиком. Игровой поток с диском не работает.
+import atexit
+import json
+import os
+import threading
+import time
+
+STORAGE_FILE = os.path.join(os.path.expanduser("~"), ".2048_best_score.json")
+# Сколько ждать после изменения, чтобы собрать несколько изменений в одну запись
+FLUSH_DELAY = 0.5
+
+
+class Storage:
+    def __init__(self, path=STORAGE_FILE, flush_delay=FLUSH_DELAY):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.dirty = threading.Event()
+        self.closed = False
+        self.version = 0
+        self.written_version = 0
+        self.data = self.load()
+        self.thread = threading.Thread(target=self.run, name="storage-flush", daemon=True)
+        self.thread.start()
+
+    def load(self):
+        data = {"best_scores": {}, "sessions": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return data
+        if not isinstance(stored, dict):
+            return data
+        for key in data:
+            if isinstance(stored.get(key), dict):
+                data[key] = stored[key]
+        # Старый формат: один рекорд без размера поля — считаем его рекордом 4x4
+        if "best_score" in stored and "4" not in data["best_scores"]:
+            try:
+                data["best_scores"]["4"] = int(stored["best_score"])
+            except (TypeError, ValueError):
+                pass
+        return data
+
+    # --- рекорды ---
+
+    def best_score(self, grid_size):
+        with self.lock:
+            return int(self.data["best_scores"].get(str(grid_size), 0))
+
+    def update_best(self, grid_size, score):
+        with self.lock:
+            key = str(grid_size)
+            if score <= self.data["best_scores"].get(key, 0):
+                return False
+            self.data["best_scores"][key] = int(score)
+        self.mark_dirty()
+        return True
+
+    # --- автосохранение партии ---
+
+    def load_session(self, grid_size):
+        with self.lock:
+            session = self.data["sessions"].get(str(grid_size))
+            return dict(session) if session else None
+
+    def save_session(self, grid_size, session):
+        with self.lock:
+            self.data["sessions"][str(grid_size)] = session
+        self.mark_dirty()
+
+    def clear_session(self, grid_size):
+        with self.lock:
+            if self.data["sessions"].pop(str(grid_size), None) is None:
+                return
+        self.mark_dirty()
+
+    # --- запись на диск ---
+
+    def mark_dirty(self):
+        with self.lock:
+            self.version += 1
+        self.dirty.set()
+
+    def run(self):
+        while not self.closed:
+            self.dirty.wait()
+            if self.closed:
+                break
+            # Даём изменениям накопиться, потом пишем одним файлом
+            time.sleep(self.flush_delay)
+            self.dirty.clear()
+            self.flush()
+
+    def flush(self):
+        # write_lock — чтобы фоновый поток и close() не писали файл одновременно
+        with self.write_lock:
+            with self.lock:
+                if self.version == self.written_version:
+                    return
+                version = self.version
+                payload = json.dumps(self.data, ensure_ascii=False)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError:
+                return
+            with self.lock:
+                self.written_version = version
+
+    def close(self):
+        self.closed = True
+        self.dirty.set()
+        self.flush()
+
+
+_storage = None
+
+
+def get_storage():
+    # Одно хранилище на процесс; при выходе несохранённое дописывается
+    global _storage
+    if _storage is None:
+        _storage = Storage()
+        atexit.register(_storage.close)
+    return _storage
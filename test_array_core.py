@@ -0,0 +1,46 @@
+# Сверка ArrayCore (большие поля на numpy) с GameCore на полях 4x4–7x7 и с
+# BatchSimulator на 16x16 и 32x32: те же seed и ходы — те же поле, счёт и ГСЧ.
+#
+#   python -m pytest -q test_array_core.py
+import numpy as np
+import pytest
+
+from array_core import ArrayCore
+from batch import BatchSimulator
+from game_core import GameCore
+
+STEPS = 500
+
+
+def check_same(core, other, moves):
+    assert core.grid == other.grid
+    for t, direction in enumerate(moves):
+        assert core.step(direction) == other.step(direction), t
+        assert core.grid == other.grid, t
+        assert core.score == other.score, t
+        assert core.rng.counter == other.rng.counter, t
+        assert (core.win, core.game_over) == (other.win, other.game_over), t
+        assert core.max_tile() == other.max_tile(), t
+        if core.win or core.game_over:
+            break
+
+
+@pytest.mark.parametrize("size", (4, 5, 7))
+def test_matches_game_core(size):
+    moves = np.random.default_rng(size).integers(0, 4, STEPS).tolist()
+    check_same(ArrayCore(size, seed=size), GameCore(size, seed=size), moves)
+
+
+@pytest.mark.parametrize("size", (16, 32))
+def test_matches_batch_simulator(size):
+    seed = 1000 + size
+    core = ArrayCore(size, seed=seed)
+    sim = BatchSimulator(1, size, seeds=[seed])
+    assert core.grid == sim.grid(0)
+    for t, direction in enumerate(np.random.default_rng(size).integers(0, 4, STEPS)):
+        changed, _, _ = sim.step(np.array([direction]))
+        assert core.step(int(direction)) == bool(changed[0]), t
+        assert core.grid == sim.grid(0), t
+        assert core.score == int(sim.scores[0]), t
+        assert core.rng.counter == int(sim.counters[0]), t
+        assert core.max_tile() == int(sim.max_tiles()[0]), t
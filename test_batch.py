@@ -0,0 +1,35 @@
+# Сверка BatchSimulator с GameCore: доска i пачки со seed ведёт себя бит в бит
+# как GameCore(size, seed=derive_seed(seed, i)) на тех же случайных ходах.
+#
+#   python -m pytest -q test_batch.py
+import numpy as np
+import pytest
+
+from batch import BatchSimulator
+from game_core import GameCore
+from rng import derive_seed
+
+GRID_SIZES = (4, 5, 7)
+BOARDS = 32
+STEPS = 400
+
+
+@pytest.mark.parametrize("size", GRID_SIZES)
+def test_batch_matches_game_core(size):
+    seed = 2048 + size
+    sim = BatchSimulator(BOARDS, size, seed)
+    cores = [GameCore(size, seed=derive_seed(seed, i)) for i in range(BOARDS)]
+    rng = np.random.default_rng(size)
+    for i, core in enumerate(cores):
+        assert sim.grid(i) == core.grid
+    for t in range(STEPS):
+        moves = rng.integers(0, 4, BOARDS)
+        changed, _, done = sim.step(moves)
+        for i, core in enumerate(cores):
+            assert bool(changed[i]) == core.step(int(moves[i])), (i, t)
+            assert sim.grid(i) == core.grid, (i, t)
+            assert int(sim.scores[i]) == core.score, (i, t)
+            assert int(sim.counters[i]) == core.rng.counter, (i, t)
+            assert bool(sim.won[i]) == core.win and bool(sim.lost[i]) == core.game_over, (i, t)
+        if done.all():
+            break
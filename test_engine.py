@@ -0,0 +1,73 @@
+# Сверка упакованного Engine.move со списочной реализацией хода
+# (GameCore.merge_list_left) на случайных полях всех размеров.
+#
+#   python -m pytest -q test_engine.py
+import random
+
+import pytest
+
+from engine import get_engine, cell_bits, LEFT, RIGHT, UP, DOWN
+from game_core import GameCore
+
+GRID_SIZES = (4, 5, 7)
+BOARDS_PER_SIZE = 2000
+
+
+def list_move(grid, direction):
+    # Ход на списках: r = 0 — нижняя строка, UP двигает плитки к большим r
+    n = len(grid)
+    merge = GameCore.merge_list_left
+    result = [[0] * n for _ in range(n)]
+    total = 0
+    for i in range(n):
+        if direction in (LEFT, RIGHT):
+            line = grid[i] if direction == LEFT else grid[i][::-1]
+        else:
+            column = [grid[r][i] for r in range(n)]
+            line = column if direction == DOWN else column[::-1]
+        merged, score = merge(line)
+        total += score
+        if direction in (RIGHT, UP):
+            merged = merged[::-1]
+        for j, value in enumerate(merged):
+            if direction in (LEFT, RIGHT):
+                result[i][j] = value
+            else:
+                result[j][i] = value
+    return result, total
+
+
+def random_grid(rng, n, max_exp):
+    # Много мелких одинаковых плиток — чтобы слияний было много; показатели
+    # ниже предела клетки, иначе списочная версия слила бы то, что Engine не сливает
+    high = rng.choice((3, 6, max_exp - 1))
+    return [[0 if rng.random() < 0.3 else 1 << rng.randint(1, high) for _ in range(n)] for _ in range(n)]
+
+
+@pytest.mark.parametrize("size", GRID_SIZES)
+def test_move_matches_list_implementation(size):
+    engine = get_engine(size)
+    rng = random.Random(size)
+    for _ in range(BOARDS_PER_SIZE):
+        grid = random_grid(rng, size, engine.max_exp)
+        board = engine.pack(grid)
+        assert engine.unpack(board) == grid
+        for direction in (LEFT, RIGHT, UP, DOWN):
+            moved, score = engine.move(board, direction)
+            expected, expected_score = list_move(grid, direction)
+            assert engine.unpack(moved) == expected, (grid, direction)
+            assert score == expected_score, (grid, direction)
+
+
+def test_cell_cap_on_4x4():
+    # В 4 бита помещается максимум 2^15 = 32768: такие плитки не сливаются
+    engine = get_engine(4)
+    assert cell_bits(4) == 4 and engine.max_exp == 15
+    top = 1 << engine.max_exp
+    grid = [[top, top, 0, 0], [16384, 16384, 2, 2], [0] * 4, [0] * 4]
+    moved, score = engine.move(engine.pack(grid), LEFT)
+    assert engine.unpack(moved) == [[top, top, 0, 0], [top, 4, 0, 0], [0] * 4, [0] * 4]
+    assert score == top + 4
+    moved, score = engine.move(engine.pack(grid), DOWN)
+    assert engine.unpack(moved) == [[top, top, 2, 2], [16384, 16384, 0, 0], [0] * 4, [0] * 4]
+    assert score == 0
@@ -0,0 +1,96 @@
+# История ходов: отмена и повтор восстанавливают состояние бит в бит —
+# поле, счёт, счётчик ГСЧ и флаги, для GameCore и для байтов ArrayCore.
+#
+#   python -m pytest -q test_history.py
+import random
+
+import pytest
+
+from array_core import ArrayCore
+from game_core import GameCore
+from history import History
+from replay import ReplayRecorder, read_replays, verify_group
+
+CORES = [(GameCore, 4), (GameCore, 5), (GameCore, 7), (ArrayCore, 16)]
+ACTIONS = 600
+
+
+def state(core):
+    return core.board_to_bytes(), core.score, core.rng.counter, core.win, core.game_over, core.max_tile()
+
+
+def move(core, history, direction):
+    before = history.pack(direction)
+    if not core.step(direction):
+        return False
+    history.record(before)
+    return True
+
+
+def play(core, history, rng, actions=ACTIONS):
+    # Случайные ходы, отмены и повторы; path — состояния текущей ветки
+    path, future = [state(core)], []
+    for _ in range(actions):
+        roll = rng.random()
+        if roll < 0.2 and history.can_undo():
+            direction = history.undo()
+            future.append(path.pop())
+            assert state(core) == path[-1]
+            # Тот же ход заново даёт ту же плитку: счётчик ГСЧ восстановлен
+            if rng.random() < 0.3:
+                assert move(core, history, direction)
+                assert state(core) == future.pop()
+                path.append(state(core))
+                future = []
+        elif roll < 0.35 and history.can_redo():
+            history.redo()
+            path.append(future.pop())
+            assert state(core) == path[-1]
+        elif not (core.win or core.game_over):
+            if move(core, history, rng.randrange(4)):
+                path.append(state(core))
+                future = []
+                assert not history.can_redo()
+    return path
+
+
+@pytest.mark.parametrize("factory, size", CORES)
+def test_undo_redo_exact(factory, size):
+    core = factory(size, seed=size)
+    history = History(core)
+    path = play(core, history, random.Random(size))
+    # Отмена до самого начала проходит все состояния ветки в обратном порядке
+    while history.can_undo():
+        path.pop()
+        history.undo()
+        assert state(core) == path[-1]
+    assert len(path) == 1
+
+
+def test_memory_limit_drops_oldest():
+    core = GameCore(4, seed=1)
+    history = History(core, max_bytes=1024)
+    limit = history.undo_stack.maxlen
+    rng = random.Random(1)
+    moves = 0
+    while moves < limit * 3 and not (core.win or core.game_over):
+        moves += move(core, history, rng.randrange(4))
+    assert len(history.undo_stack) == min(moves, limit)
+    undone = 0
+    while history.undo() is not None:
+        undone += 1
+    assert undone == min(moves, limit)
+    assert len(history.redo_stack) == undone
+
+
+@pytest.mark.parametrize("factory, size", CORES)
+def test_replay_follows_undo_redo(tmp_path, factory, size):
+    # Реплей после отмен и повторов — ровно ходы текущей ветки
+    recorder = ReplayRecorder(str(tmp_path))
+    core = factory(size, seed=size, recorder=recorder)
+    history = History(core)
+    play(core, history, random.Random(size + 1), 300)
+    recorder.close()
+    records = list(read_replays(recorder.path))
+    assert len(records) == 1 and len(records[0][5]) == recorder.moves
+    assert verify_group(size, records).all()
@@ -0,0 +1,108 @@
+# Реплеи: запись партии GameCore и проверка verify_group, отказ на подделках,
+# продолжение записи после падения без close.
+#
+#   python -m pytest -q test_replay.py
+import os
+import random
+
+import pytest
+
+from game_core import GameCore
+from replay import ReplayRecorder, read_replays, verify_group, verify_task, verify_tasks, FLAG_FINISHED
+
+GRID_SIZES = (4, 5, 7)
+GAMES = 6
+
+
+def play(core, rng, limit=None):
+    moves = 0
+    while not (core.win or core.game_over) and moves != limit:
+        if core.step(rng.randrange(4)):
+            moves += 1
+
+
+def record_games(directory, size, games=GAMES):
+    # Законченные партии случайными ходами, по одной на файл
+    rng = random.Random(size)
+    recorder = ReplayRecorder(directory)
+    paths = []
+    for i in range(games):
+        core = GameCore(size, seed=i, recorder=recorder)
+        play(core, rng)
+        if not (core.win or core.game_over):
+            recorder.close()
+        paths.append(recorder.path)
+    return paths
+
+
+@pytest.mark.parametrize("size", GRID_SIZES)
+def test_round_trip(tmp_path, size):
+    paths = record_games(str(tmp_path), size, 3)
+    records = [record for path in paths for record in read_replays(path)]
+    assert len(records) == 3
+    assert verify_group(size, records).all()
+    total, bad = verify_task(next(verify_tasks([str(tmp_path)])))
+    assert (total, bad) == (3, [])
+
+
+def test_replay_reproduces_game(tmp_path):
+    rng = random.Random(1)
+    recorder = ReplayRecorder(str(tmp_path))
+    core = GameCore(4, seed=7, recorder=recorder)
+    play(core, rng)
+    (grid_size, flags, seed, counter, score, moves), = read_replays(recorder.path)
+    assert flags & FLAG_FINISHED and score == core.score
+    replayed = GameCore(grid_size, seed=seed)
+    replayed.rng.counter = counter
+    replayed.reset()
+    for direction in moves:
+        assert replayed.step(direction)
+    assert replayed.grid == core.grid and replayed.score == core.score
+
+
+def test_tampered_replays_rejected(tmp_path):
+    paths = record_games(str(tmp_path), 4)
+    records = [record for path in paths for record in read_replays(path)]
+    finished = [r for r in records if r[1] & FLAG_FINISHED]
+    assert finished
+    grid_size, flags, seed, counter, score, moves = finished[0]
+    forged = [
+        # Завышенный счёт
+        (grid_size, flags, seed, counter, score + 4, moves),
+        # Чужой seed — ходы не подходят к полю
+        (grid_size, flags, seed + 1, counter, score, moves),
+        # Ход после конца партии
+        (grid_size, flags, seed, counter, score, moves + [moves[-1]]),
+        # Подменённый ход в середине партии
+        (grid_size, flags, seed, counter, score, moves[:10] + [moves[10] ^ 1] + moves[11:]),
+        # Партия объявлена законченной раньше конца
+        (grid_size, flags, seed, counter, score, moves[:-1]),
+    ]
+    valid = verify_group(grid_size, [finished[0]] + forged)
+    assert valid.tolist() == [True] + [False] * len(forged)
+
+
+def test_resume_after_crash(tmp_path):
+    # Автосохранение делает sync; процесс падает, буфер файла теряется
+    rng = random.Random(3)
+    recorder = ReplayRecorder(str(tmp_path))
+    core = GameCore(4, seed=11, recorder=recorder)
+    play(core, rng, 37)
+    recorder.sync()
+    saved = core.snapshot(), recorder.moves
+    play(core, rng, 2)
+    path = recorder.path
+    os.close(recorder.file.fileno())
+    with pytest.raises(OSError):
+        recorder.file.close()
+    recorder.file = None
+
+    resumed = ReplayRecorder(str(tmp_path))
+    assert resumed.resume(path, saved[1])
+    core = GameCore(4)
+    core.restore(saved[0])
+    core.recorder = resumed
+    play(core, rng)
+    records = list(read_replays(path))
+    assert len(records) == 1 and len(records[0][5]) == resumed.moves
+    assert verify_group(4, records).all()
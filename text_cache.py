@@ -0,0 +1,125 @@
+# Кэш текстур с текстом. Строка растеризуется через PIL один раз, дальше
+# это спрайт — один текстурированный прямоугольник в SpriteList, без вёрстки
+# pyglet на каждый кадр или смену подписи. Ключ — строка, шрифт, размер,
+# цвета, обводка и ширина переноса; лишнее вытесняет LRU. Вытесненная
+# текстура уходит из атласа arcade, когда на неё не ссылается ни один спрайт.
+import hashlib
+from collections import OrderedDict
+from functools import lru_cache
+
+import arcade
+from PIL import Image, ImageDraw, ImageFont
+
+TEXT_CACHE_SIZE = 256
+# Размер шрифта в пунктах, как у arcade.Text; pyglet считает 96 точек на дюйм
+PIXELS_PER_POINT = 96 / 72
+# Межстрочный интервал многострочного текста, доля размера шрифта
+LINE_SPACING = 0.3
+# Файлы для имён шрифтов pyglet; если их нет — шрифт из ресурсов arcade
+FONT_FILES = {
+    "Comic Sans MS": ("comic.ttf", "Comic Sans MS.ttf", "Comic_Sans_MS.ttf"),
+}
+FALLBACK_FONT = ":system:fonts/ttf/Liberation/Liberation_Sans_Regular.ttf"
+
+
+@lru_cache(maxsize=None)
+def load_font(font_name, pixel_size):
+    for path in FONT_FILES.get(font_name, (font_name,) if font_name else ()):
+        try:
+            return ImageFont.truetype(path, pixel_size)
+        except OSError:
+            continue
+    return ImageFont.truetype(str(arcade.resources.resolve(FALLBACK_FONT)), pixel_size)
+
+
+def wrap(text, font, width):
+    # Перенос по словам в пределах width пикселей, абзацы — по \n
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def render_text(text, font_size, color, font_name=None, outline_color=None, outline_width=0,
+                width=None, align="left"):
+    size = max(1, round(font_size * PIXELS_PER_POINT))
+    font = load_font(font_name, size)
+    if width:
+        text = wrap(text, font, width)
+    spacing = int(size * LINE_SPACING)
+    stroke = outline_width if outline_color else 0
+    probe = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = probe.multiline_textbbox((0, 0), text, font=font, spacing=spacing,
+                                                        align=align, stroke_width=stroke)
+    image = Image.new("RGBA", (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+    ImageDraw.Draw(image).multiline_text((-left, -top), text, font=font, fill=tuple(color), spacing=spacing,
+                                         align=align, stroke_width=stroke,
+                                         stroke_fill=tuple(outline_color) if stroke else None)
+    return image
+
+
+class TextCache:
+    def __init__(self, max_items=TEXT_CACHE_SIZE):
+        self.max_items = max_items
+        self.textures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def texture(self, text, font_size, color, font_name=None, outline_color=None, outline_width=0,
+                width=None, align="left"):
+        key = (text, font_size, tuple(color), font_name, tuple(outline_color) if outline_color else None,
+               outline_width, width, align)
+        texture = self.textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self.textures.move_to_end(key)
+            return texture
+        self.misses += 1
+        image = render_text(text, font_size, color, font_name, outline_color, outline_width, width, align)
+        texture = arcade.Texture(image, hit_box_algorithm=arcade.hitbox.algo_bounding_box,
+                                 hash="text-" + hashlib.md5(repr(key).encode()).hexdigest())
+        self.textures[key] = texture
+        if len(self.textures) > self.max_items:
+            self.textures.popitem(last=False)
+        return texture
+
+    def sprite(self, text, x, y, font_size, color, anchor_x="left", anchor_y="baseline", **style):
+        sprite = arcade.Sprite(self.texture(text, font_size, color, **style))
+        place(sprite, x, y, anchor_x, anchor_y)
+        return sprite
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"items": len(self.textures), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0}
+
+
+def place(sprite, x, y, anchor_x="center", anchor_y="center"):
+    # Привязка как у arcade.Text; baseline считается низом текстуры
+    if anchor_x == "left":
+        x += sprite.width / 2
+    elif anchor_x == "right":
+        x -= sprite.width / 2
+    if anchor_y in ("bottom", "baseline"):
+        y += sprite.height / 2
+    elif anchor_y == "top":
+        y -= sprite.height / 2
+    sprite.position = (x, y)
+
+
+_text_cache = None
+
+
+def get_text_cache():
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = TextCache()
+    return _text_cache
@@ -0,0 +1,198 @@
+# Турнир стратегий: много партий на пуле процессов.
+# Пример: python tournament.py --games 100000 --sizes 4 5 7 --strategies random corner
+import argparse
+import itertools
+import json
+import struct
+import time
+from multiprocessing import Pool, cpu_count
+
+from engine import get_engine, LEFT, RIGHT, UP, DOWN
+from game_core import GameCore
+from rng import SplitMix64, derive_seed
+from stats import GameStats
+from leaderboard import Leaderboard, LEADERBOARD_FILE
+from position_cache import POSITION_CACHE_FILE
+
+GRID_SIZES = (4, 5, 7)
+DIRECTIONS = (LEFT, RIGHT, UP, DOWN)
+# Угловая стратегия держит крупные плитки в левом нижнем углу
+CORNER_ORDER = (DOWN, LEFT, RIGHT, UP)
+
+# Запись о партии: размер, стратегия, победа, счёт, макс. плитка, ходы, время
+RECORD = struct.Struct("<BBBIIId")
+
+
+def legal_moves(engine, board):
+    moves = []
+    for direction in DIRECTIONS:
+        moved, gained = engine.move(board, direction)
+        if moved != board:
+            moves.append((direction, moved, gained))
+    return moves
+
+
+class RandomStrategy:
+    def __init__(self, grid_size, seed, options):
+        self.engine = get_engine(grid_size)
+        self.rng = SplitMix64(seed)
+
+    def choose(self, board):
+        moves = legal_moves(self.engine, board)
+        return moves[int(self.rng.random() * len(moves))][0] if moves else None
+
+
+class GreedyStrategy:
+    # Максимум очков за ход, при равенстве — больше пустых клеток
+    def __init__(self, grid_size, seed, options):
+        self.engine = get_engine(grid_size)
+
+    def choose(self, board):
+        best, best_key = None, None
+        for direction, moved, gained in legal_moves(self.engine, board):
+            key = (gained, len(self.engine.empty_shifts(moved)))
+            if best_key is None or key > best_key:
+                best, best_key = direction, key
+        return best
+
+
+class CornerStrategy:
+    def __init__(self, grid_size, seed, options):
+        self.engine = get_engine(grid_size)
+
+    def choose(self, board):
+        for direction in CORNER_ORDER:
+            moved, _ = self.engine.move(board, direction)
+            if moved != board:
+                return direction
+        return None
+
+
+class ExpectimaxStrategy:
+    # Фиксированная глубина без лимита времени — результаты воспроизводимы.
+    # С --positions воркеры делят файл кэша позиций: меньше счёта, но оценки
+    # могут прийти из другого порядка обхода, и ход в редких ничьих — другой
+    def __init__(self, grid_size, seed, options):
+        from solver import Expectimax
+        positions = None
+        if options.get("positions"):
+            from position_cache import open_position_cache
+            positions = open_position_cache(grid_size, options["positions"].format(grid_size))
+        self.solver = Expectimax(grid_size, time_budget=float("inf"), max_depth=options["depth"],
+                                 positions=positions)
+
+    def choose(self, board):
+        return self.solver.best_move(board)
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "greedy": GreedyStrategy,
+    "corner": CornerStrategy,
+    "expectimax": ExpectimaxStrategy,
+}
+STRATEGY_NAMES = list(STRATEGIES)
+
+
+def play_game(grid_size, strategy, seed):
+    start = time.perf_counter()
+    core = GameCore(grid_size, seed=seed)
+    moves = 0
+    while not (core.win or core.game_over):
+        direction = strategy.choose(core.board)
+        if direction is None or not core.step(direction):
+            break
+        moves += 1
+    return core.win, core.score, core.max_tile(), moves, time.perf_counter() - start
+
+
+def play_chunk(task):
+    # Один кусок работы: games партий с seed, зависящим только от номера куска
+    grid_size, strategy_name, chunk_id, games, base_seed, options = task
+    chunk_seed = derive_seed(base_seed, chunk_id)
+    strategy = STRATEGIES[strategy_name](grid_size, derive_seed(chunk_seed, games), options)
+    strategy_id = STRATEGY_NAMES.index(strategy_name)
+    out = bytearray()
+    for i in range(games):
+        won, score, max_tile, moves, wall = play_game(grid_size, strategy, derive_seed(chunk_seed, i))
+        out += RECORD.pack(grid_size, strategy_id, won, score, max_tile, moves, wall)
+    return bytes(out)
+
+
+def make_tasks(sizes, strategies, games, chunk, seed, options):
+    chunk_id = itertools.count()
+    for grid_size in sizes:
+        for name in strategies:
+            for done in range(0, games, chunk):
+                yield grid_size, name, next(chunk_id), min(chunk, games - done), seed, options
+
+
+def print_report(groups, started):
+    elapsed = time.perf_counter() - started
+    total = sum(g.games for g in groups.values())
+    print(f"--- {total} партий, {elapsed:.1f} с, {total / elapsed if elapsed else 0:.0f} партий/с")
+    for (grid_size, name), stats in sorted(groups.items()):
+        s = stats.summary()
+        top_tile = max(stats.max_tiles) if stats.max_tiles else 0
+        print(f"{grid_size}x{grid_size} {name:<10} n={s['games']:<9} mean={s['mean_score']:<9.0f} "
+              f"p50={s['p50']:<8.0f} p90={s['p90']:<8.0f} p99={s['p99']:<8.0f} "
+              f"wins={s['wins']} top={top_tile}")
+
+
+def run(args):
+    options = {"depth": args.depth, "positions": args.positions}
+    tasks = make_tasks(args.sizes, args.strategies, args.games, args.chunk, args.seed, options)
+    groups = {}
+    board = None
+    if args.leaderboard:
+        board = Leaderboard(args.leaderboard)
+    started = last_report = time.perf_counter()
+    with Pool(args.workers) as pool:
+        for data in pool.imap_unordered(play_chunk, tasks):
+            played_at = time.time()
+            for grid_size, strategy_id, won, score, max_tile, moves, wall in RECORD.iter_unpack(data):
+                key = (grid_size, STRATEGY_NAMES[strategy_id])
+                stats = groups.get(key)
+                if stats is None:
+                    stats = groups[key] = GameStats()
+                stats.add(score, max_tile, moves, wall, won)
+            if board is not None:
+                # Кусок целиком уходит в базу одной пачкой
+                board.add_many((grid_size, score, max_tile, moves, won, STRATEGY_NAMES[strategy_id], played_at)
+                               for grid_size, strategy_id, won, score, max_tile, moves, wall
+                               in RECORD.iter_unpack(data))
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                print_report(groups, started)
+                last_report = now
+    print_report(groups, started)
+    if board is not None:
+        board.close()
+
+    if args.json:
+        result = {f"{size}x{size}/{name}": stats.summary() for (size, name), stats in sorted(groups.items())}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return groups
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Турнир стратегий 2048")
+    parser.add_argument("--games", type=int, default=1000, help="партий на каждую пару размер/стратегия")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(GRID_SIZES), choices=GRID_SIZES)
+    parser.add_argument("--strategies", nargs="+", default=["random", "greedy", "corner"], choices=STRATEGY_NAMES)
+    parser.add_argument("--workers", type=int, default=cpu_count())
+    parser.add_argument("--chunk", type=int, default=200, help="партий в одном задании воркера")
+    parser.add_argument("--seed", type=int, default=2048)
+    parser.add_argument("--depth", type=int, default=2, help="глубина expectimax")
+    parser.add_argument("--report-every", type=float, default=5.0, help="секунд между отчётами")
+    parser.add_argument("--json", help="куда сохранить итоговую сводку")
+    parser.add_argument("--leaderboard", nargs="?", const=LEADERBOARD_FILE,
+                        help="записать партии в таблицу лидеров (SQLite)")
+    parser.add_argument("--positions", nargs="?", const=POSITION_CACHE_FILE,
+                        help="общий кэш позиций expectimax ({} в пути — размер поля)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    run(parse_args())